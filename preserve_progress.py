@@ -7,15 +7,24 @@ Run this to verify your completed work is properly preserved.
 import os
 from pathlib import Path
 
+def _count_stringtables(root: Path) -> int:
+    """Count .stringtable files under root without building Path objects"""
+    return sum(
+        1
+        for _, _, filenames in os.walk(root)
+        for filename in filenames
+        if filename.endswith(".stringtable")
+    )
+
 def check_progress():
     """Check current progress status"""
     print("=== PILLARS OF ETERNITY FARSI TRANSLATION PROGRESS ===")
     
     # Check output files
     output_dir = Path("out/localized/it/text")
+    completed_count = _count_stringtables(output_dir) if output_dir.exists() else 0
     if output_dir.exists():
-        completed_files = list(output_dir.rglob("*.stringtable"))
-        print(f"✅ Completed translations: {len(completed_files)} files")
+        print(f"✅ Completed translations: {completed_count} files")
         print(f"📁 Location: {output_dir}")
     else:
         print("❌ No completed translations found")
@@ -32,10 +41,10 @@ def check_progress():
     # Check Input files
     input_dir = Path("Input")
     if input_dir.exists():
-        input_files = list(input_dir.rglob("*.stringtable"))
-        print(f"✅ Input files available: {len(input_files)} files")
-        remaining = len(input_files) - len(completed_files) if output_dir.exists() else len(input_files)
-        print(f"📊 Progress: {len(completed_files) if output_dir.exists() else 0}/{len(input_files)} files ({len(completed_files)/len(input_files)*100 if output_dir.exists() and input_files else 0:.1f}%)")
+        input_count = _count_stringtables(input_dir)
+        print(f"✅ Input files available: {input_count} files")
+        remaining = input_count - completed_count
+        print(f"📊 Progress: {completed_count}/{input_count} files ({completed_count/input_count*100 if input_count else 0:.1f}%)")
         print(f"⏳ Remaining: {remaining} files")
     else:
         print("❌ Input directory not found")
@@ -2,11 +2,74 @@
 SQLite-based caching system for translations.
 """
 
+import atexit
 import hashlib
 import logging
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Bumped whenever the on-disk layout changes; see _migrate_legacy_table
+_SCHEMA_VERSION = 1
+
+# Bytes of the database file SQLite may memory-map (256 MiB)
+_MMAP_SIZE = 256 * 1024 * 1024
+
+# Preconfigured hasher; copying it is cheaper than constructing one per text
+_HASH_BASE = hashlib.blake2b(digest_size=16)
+
+# Keyed directly by the 16-byte digest: one B-tree, no rowid table
+_CREATE_TRANSLATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS translations (
+        text_hash BLOB PRIMARY KEY,
+        original_text TEXT NOT NULL,
+        translated_text TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+"""
+
+# The hot-path statements below are module constants so every call hands
+# sqlite3 the same SQL text and reuses its prepared statement
+# Lookups also return the stored original so a digest collision is never
+# served as a hit
+_SELECT_TRANSLATION = "SELECT original_text, translated_text FROM translations WHERE text_hash = ?"
+
+_SELECT_TRANSLATIONS_IN = (
+    "SELECT text_hash, original_text, translated_text FROM translations WHERE text_hash IN ({placeholders})"
+)
+
+_UPSERT_TRANSLATION = """
+    INSERT OR REPLACE INTO translations 
+    (text_hash, original_text, translated_text)
+    VALUES (?, ?, ?)
+"""
+
+_SELECT_FILE_STATES = "SELECT input_relpath, input_mtime, input_size FROM file_state"
+
+_UPSERT_FILE_STATE = """
+    INSERT OR REPLACE INTO file_state 
+    (input_relpath, input_mtime, input_size, output_mtime)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Prepared statements kept per connection (sqlite3 defaults to 128); the
+# bulk lookup produces one distinct statement per chunk length
+_CACHED_STATEMENTS = 256
+
+# Upper bound on translations kept in the in-process LRU
+_MEMORY_CACHE_SIZE = 100_000
+
+# Stay well below SQLITE_MAX_VARIABLE_NUMBER for IN (...) lookups
+_BULK_LOOKUP_CHUNK = 500
+
+# Buffered writes are committed once this many are pending or the oldest
+# has waited this many seconds (checked on the next store)
+_FLUSH_SIZE = 500
+_FLUSH_INTERVAL = 5.0
 
 
 class TranslationCache:
@@ -15,113 +78,339 @@ class TranslationCache:
     def __init__(self, cache_file: Path = Path("translation_cache.db")):
         self.cache_file = cache_file
         self.logger = logging.getLogger(__name__)
+        # One connection is shared by every call (and every thread), so
+        # access to it is serialised with a lock
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Repeated strings ("Yes", names, tags) are answered from memory
+        self._mem: "OrderedDict[str, str]" = OrderedDict()
+        # Write-behind buffer of rows not yet committed, keyed by text hash
+        self._pending: Dict[bytes, Tuple[str, str]] = {}
+        self._last_flush = time.monotonic()
         self._init_database()
+        # Commit whatever is still buffered when the interpreter exits
+        atexit.register(self.flush)
     
     def _init_database(self) -> None:
-        """Initialize the SQLite database."""
+        """Open the long-lived connection and initialize the SQLite database."""
         try:
-            with sqlite3.connect(self.cache_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS translations (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        text_hash TEXT UNIQUE NOT NULL,
-                        original_text TEXT NOT NULL,
-                        translated_text TEXT NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Create index for faster lookups
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_text_hash 
-                    ON translations(text_hash)
-                """)
-                
-                conn.commit()
+            self._conn = sqlite3.connect(
+                self.cache_file,
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=_CACHED_STATEMENTS
+            )
+            
+            # WAL + relaxed syncing avoids an fsync per write; the rest keeps
+            # temporary data and hot pages in memory, and reads the file
+            # through a memory map instead of read() calls
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA temp_store=MEMORY")
+            self._conn.execute("PRAGMA cache_size=-65536")
+            self._conn.execute(f"PRAGMA mmap_size={_MMAP_SIZE}")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            
+            schema_version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if schema_version < _SCHEMA_VERSION and self._table_exists("translations"):
+                self._migrate_legacy_table()
+            
+            self._conn.execute(_CREATE_TRANSLATIONS_TABLE)
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Database initialization failed: {e}")
+            self.logger.error("Database initialization failed: %s", e)
             raise
     
-    def _hash_text(self, text: str) -> str:
-        """Create a hash of the text for efficient lookup."""
-        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    def _table_exists(self, name: str) -> bool:
+        """Check whether a table exists in the database."""
+        row = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (name,)
+        ).fetchone()
+        return row is not None
+    
+    def _migrate_legacy_table(self) -> None:
+        """Rebuild a pre-BLAKE2b cache (SHA-256 hex keys, rowid table) in place."""
+        self.logger.info("Migrating translation cache to the current schema...")
+        
+        self._conn.create_function("blake2b_key", 1, self._hash_text, deterministic=True)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("ALTER TABLE translations RENAME TO translations_legacy")
+            self._conn.execute("DROP INDEX IF EXISTS idx_text_hash")
+            self._conn.execute(_CREATE_TRANSLATIONS_TABLE)
+            # Oldest first, so the newest translation of a text wins
+            self._conn.execute("""
+                INSERT OR REPLACE INTO translations 
+                (text_hash, original_text, translated_text, created_at)
+                SELECT blake2b_key(original_text), original_text, translated_text, created_at
+                FROM translations_legacy
+                ORDER BY id
+            """)
+            self._conn.execute("DROP TABLE translations_legacy")
+            # Leftover AUTOINCREMENT bookkeeping for the dropped id column
+            if self._table_exists("sqlite_sequence"):
+                self._conn.execute("DELETE FROM sqlite_sequence WHERE name = 'translations_legacy'")
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        except sqlite3.Error:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        
+        # The old rowid table and its index are now free pages; hand them
+        # back so the file actually shrinks
+        self._conn.execute("VACUUM")
+        
+        self.logger.info("Translation cache migration complete")
+    
+    def _hash_text(self, text: str) -> bytes:
+        """Create a compact 128-bit BLAKE2b digest of the text for efficient lookup."""
+        hasher = _HASH_BASE.copy()
+        hasher.update(text.encode('utf-8'))
+        return hasher.digest()
+    
+    @staticmethod
+    def _is_usable(original_text: str, translated_text: Optional[str]) -> bool:
+        """Only non-empty translations that differ from the original count as hits."""
+        if not translated_text:
+            return False
+        translated = translated_text.strip()
+        return len(translated) > 0 and translated != original_text.strip()
+    
+    def _remember(self, original_text: str, translated_text: str) -> None:
+        """Update the in-memory LRU for a stored text (caller holds the lock)."""
+        if not self._is_usable(original_text, translated_text):
+            self._mem.pop(original_text, None)
+            return
+        
+        self._mem[original_text] = translated_text
+        self._mem.move_to_end(original_text)
+        if len(self._mem) > _MEMORY_CACHE_SIZE:
+            self._mem.popitem(last=False)
     
     def get_translation(self, original_text: str) -> Optional[str]:
         """Get cached translation for the given text."""
+        with self._lock:
+            remembered = self._mem.get(original_text)
+            if remembered is not None:
+                self._mem.move_to_end(original_text)
+                return remembered
+        
         text_hash = self._hash_text(original_text)
         
         try:
-            with sqlite3.connect(self.cache_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT translated_text FROM translations WHERE text_hash = ?",
-                    (text_hash,)
-                )
-                result = cursor.fetchone()
+            with self._lock:
+                pending = self._pending.get(text_hash)
+                if pending is not None:
+                    # Buffered rows supersede the database
+                    return pending[1] if self._is_usable(original_text, pending[1]) else None
+                
+                result = self._conn.execute(_SELECT_TRANSLATION, (text_hash,)).fetchone()
                 
-                if result and result[0]:
-                    # Only return non-empty translations that are different from original
-                    translated = result[0].strip()
-                    if len(translated) > 0 and translated != original_text.strip():
-                        return result[0]
+                if result and result[0] == original_text and self._is_usable(original_text, result[1]):
+                    self._remember(original_text, result[1])
+                    return result[1]
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Cache lookup failed: {e}")
+            self.logger.error("Cache lookup failed: %s", e)
         
         return None
     
-    def store_translation(self, original_text: str, translated_text: str) -> None:
-        """Store a translation in the cache."""
-        text_hash = self._hash_text(original_text)
+    def get_translations_bulk(self, texts: List[str]) -> Dict[str, str]:
+        """Get cached translations for many texts with one query per chunk.
+        
+        Texts held in memory are answered from there; only the rest are hashed and queried.
+        """
+        found = {}
+        with self._lock:
+            for text in texts:
+                remembered = self._mem.get(text)
+                if remembered is not None:
+                    self._mem.move_to_end(text)
+                    found[text] = remembered
+        
+        hashes = {}
+        for text in texts:
+            if text not in found:
+                hashes.setdefault(self._hash_text(text), text)
         
         try:
-            with sqlite3.connect(self.cache_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT OR REPLACE INTO translations 
-                    (text_hash, original_text, translated_text)
-                    VALUES (?, ?, ?)
-                """, (text_hash, original_text, translated_text))
+            with self._lock:
+                # Buffered rows supersede the database
+                for text_hash in [h for h in hashes if h in self._pending]:
+                    original_text, translated = self._pending[text_hash]
+                    del hashes[text_hash]
+                    if self._is_usable(original_text, translated):
+                        found[original_text] = translated
                 
-                conn.commit()
+                hash_list = list(hashes)
+                for start in range(0, len(hash_list), _BULK_LOOKUP_CHUNK):
+                    chunk = hash_list[start:start + _BULK_LOOKUP_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._conn.execute(
+                        _SELECT_TRANSLATIONS_IN.format(placeholders=placeholders),
+                        chunk
+                    ).fetchall()
+                    
+                    for text_hash, stored_text, translated in rows:
+                        original_text = hashes[text_hash]
+                        if stored_text == original_text and self._is_usable(original_text, translated):
+                            found[original_text] = translated
+                            self._remember(original_text, translated)
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Cache storage failed: {e}")
+            self.logger.error("Bulk cache lookup failed: %s", e)
+        
+        return found
+    
+    def store_translation(self, original_text: str, translated_text: str) -> None:
+        """Store a translation in the cache (buffered; see flush)."""
+        self.store_translations([(original_text, translated_text)])
+    
+    def store_translations(self, pairs: Iterable[Tuple[str, str]]) -> None:
+        """Store many (original, translated) pairs.
+        
+        Writes are buffered and committed together, in one transaction, once
+        _FLUSH_SIZE rows are pending or _FLUSH_INTERVAL seconds have passed.
+        They are visible to lookups straight away.
+        """
+        rows = [(self._hash_text(original), original, translated) for original, translated in pairs]
+        if not rows:
+            return
+        
+        with self._lock:
+            for text_hash, original, translated in rows:
+                self._pending[text_hash] = (original, translated)
+                self._remember(original, translated)
+            
+            if len(self._pending) >= _FLUSH_SIZE or time.monotonic() - self._last_flush > _FLUSH_INTERVAL:
+                self._flush_locked()
+    
+    def flush(self) -> None:
+        """Commit all buffered writes in a single transaction."""
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_locked(self) -> None:
+        """Commit the write-behind buffer (caller holds the lock)."""
+        self._last_flush = time.monotonic()
+        if not self._pending or self._conn is None:
+            return
+        
+        rows = [(text_hash, original, translated) for text_hash, (original, translated) in self._pending.items()]
+        try:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(_UPSERT_TRANSLATION, rows)
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._pending.clear()
+            
+        except sqlite3.Error as e:
+            self.logger.error("Cache batch storage failed: %s", e)
     
     def get_cache_stats(self) -> dict:
         """Get statistics about the cache."""
         try:
-            with sqlite3.connect(self.cache_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM translations")
-                total_count = cursor.fetchone()[0]
+            with self._lock:
+                self._flush_locked()
+                total_count = self._conn.execute(
+                    "SELECT COUNT(*) FROM translations"
+                ).fetchone()[0]
                 
-                cursor.execute("""
+                recent_count = self._conn.execute("""
                     SELECT COUNT(*) FROM translations 
                     WHERE created_at >= datetime('now', '-1 day')
-                """)
-                recent_count = cursor.fetchone()[0]
-                
-                return {
-                    "total_translations": total_count,
-                    "recent_translations": recent_count
-                }
+                """).fetchone()[0]
+            
+            return {
+                "total_translations": total_count,
+                "recent_translations": recent_count
+            }
                 
         except sqlite3.Error as e:
-            self.logger.error(f"Cache stats failed: {e}")
+            self.logger.error("Cache stats failed: %s", e)
             return {"total_translations": 0, "recent_translations": 0}
     
     def clear_cache(self) -> None:
         """Clear all cached translations."""
         try:
-            with sqlite3.connect(self.cache_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM translations")
-                conn.commit()
+            with self._lock:
+                self._conn.execute("DELETE FROM translations")
+                self._mem.clear()
+                self._pending.clear()
                 
             self.logger.info("Cache cleared successfully")
             
         except sqlite3.Error as e:
-            self.logger.error(f"Cache clearing failed: {e}")
+            self.logger.error("Cache clearing failed: %s", e)
+    
+    def close(self) -> None:
+        """Commit buffered writes and close the underlying database connection."""
+        atexit.unregister(self.flush)
+        with self._lock:
+            self._flush_locked()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class FileStateCache:
+    """Input file signatures recorded by previous builds, stored alongside the translations."""
+    
+    def __init__(self, cache: TranslationCache):
+        self.logger = logging.getLogger(__name__)
+        # Shares the translation cache's connection (and its lock)
+        self._conn = cache._conn
+        self._lock = cache._lock
+        self._init_table()
+    
+    def _init_table(self) -> None:
+        """Create the file_state table if needed."""
+        try:
+            with self._lock:
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS file_state (
+                        input_relpath TEXT PRIMARY KEY,
+                        input_mtime REAL NOT NULL,
+                        input_size INTEGER NOT NULL,
+                        output_mtime REAL NOT NULL
+                    )
+                """)
+                
+        except sqlite3.Error as e:
+            self.logger.error("File state initialization failed: %s", e)
+            raise
+    
+    def load(self) -> Dict[str, Tuple[float, int]]:
+        """Get the recorded (mtime, size) of every input, keyed by relative path."""
+        try:
+            with self._lock:
+                rows = self._conn.execute(_SELECT_FILE_STATES).fetchall()
+            return {relpath: (mtime, size) for relpath, mtime, size in rows}
+            
+        except sqlite3.Error as e:
+            self.logger.error("File state lookup failed: %s", e)
+            return {}
+    
+    def record(self, states: Iterable[Tuple[str, float, int, float]]) -> None:
+        """Store (relpath, input_mtime, input_size, output_mtime) rows in a single transaction."""
+        rows = list(states)
+        if not rows:
+            return
+        
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.executemany(_UPSERT_FILE_STATE, rows)
+                except sqlite3.Error:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self._conn.execute("COMMIT")
+                
+        except sqlite3.Error as e:
+            self.logger.error("File state storage failed: %s", e)
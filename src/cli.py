@@ -2,10 +2,12 @@
 Command-line interface for the stringtable translation tool.
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Set
 import argparse
 
+from src.cache import FileStateCache
 from src.translator import TranslationService
 from src.config import Config
 import os
@@ -13,8 +15,104 @@ from src.xml_utils import XMLProcessor
 
 logger = logging.getLogger(__name__)
 
-def build_command(input_dir: str, output_dir: str = "out") -> None:
-    """Build translated stringtable files."""
+# Anything smaller cannot be a stringtable with content, e.g. the
+# placeholder written for a failed translation
+MIN_OUTPUT_SIZE = 100
+
+def _scan_stringtables(root: Path) -> Set[str]:
+    """Collect the POSIX paths, relative to root, of every .stringtable under it."""
+    found = set()
+    if not root.is_dir():
+        return found
+    
+    stack = [(os.fspath(root), "")]
+    while stack:
+        directory, prefix = stack.pop()
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, prefix + entry.name + "/"))
+                elif entry.name.endswith(".stringtable"):
+                    found.add(prefix + entry.name)
+    return found
+
+def _process_one_file(
+    file_path: Path,
+    output_file_path: Path,
+    xml_processor: XMLProcessor,
+    translator: TranslationService,
+    config: Config,
+    translations: Optional[Dict[str, str]] = None,
+    table: Optional[Dict[str, List[str]]] = None
+) -> bool:
+    """Translate a single stringtable file and write it to its output path.
+    
+    With translations (text -> translation, e.g. from a Batch API job) the
+    texts are filled from it and no requests are made; texts missing from it
+    are left as-is. A table already parsed by parse_stringtable_soa (or
+    parse_many) is used instead of reading the file again. The output
+    directory must already exist. Returns True if the output was written,
+    False if a failure placeholder was.
+    """
+    logger.info("Processing: %s", file_path)
+    
+    try:
+        # Parse the XML file into parallel id/text lists
+        if table is None:
+            table = xml_processor.parse_stringtable_soa(file_path)
+        texts = table["texts"]
+        
+        if not texts:
+            # Create empty output file for consistency
+            xml_processor.write_stringtable(output_file_path, table, make_parents=False)
+            logger.info("Created empty file: %s", output_file_path)
+            return True
+        
+        # Extract texts for translation, remembering which entries they came from
+        text_indices = [i for i, text in enumerate(texts) if text.strip()]
+        
+        if text_indices:
+            if translations is None:
+                # translate_batch sends each distinct text once itself
+                translated_texts = translator.translate_batch(
+                    [texts[i] for i in text_indices], batch_size=config.batch_size
+                )
+            else:
+                translated_texts = [translations.get(texts[i], texts[i]) for i in text_indices]
+            
+            # Update the parsed texts in place; untranslated ones come back as-is
+            for i, translated_text in zip(text_indices, translated_texts):
+                texts[i] = translated_text
+        
+        # Write the translated file
+        xml_processor.write_stringtable(output_file_path, table, make_parents=False)
+        
+        logger.info("Completed: %s", output_file_path)
+        return True
+        
+    except Exception as e:
+        logger.error("Failed to process %s: %s", file_path, e)
+        
+        # Create an empty output file to mark as attempted
+        try:
+            output_file_path.write_text(f'<!-- Translation failed: {e} -->')
+            logger.warning("Created placeholder file for failed translation: %s", output_file_path)
+        except Exception as write_error:
+            logger.error("Could not create placeholder file: %s", write_error)
+        return False
+
+def build_command(
+    input_dir: str,
+    output_dir: str = "out",
+    max_workers: int = 4,
+    use_batch_api: bool = False,
+    resume_batch_ids: Optional[List[str]] = None
+) -> None:
+    """Build translated stringtable files.
+    
+    resume_batch_ids waits on Batch API jobs submitted by an interrupted
+    build (and implies use_batch_api) instead of submitting new ones.
+    """
     
     input_path = Path(input_dir).expanduser()
     output_path = Path(output_dir)
@@ -22,8 +120,8 @@ def build_command(input_dir: str, output_dir: str = "out") -> None:
     if not input_path.exists():
         raise ValueError(f"Input directory does not exist: {input_path}")
     
-    logger.info(f"Starting translation build from: {input_path}")
-    logger.info(f"Output directory: {output_path}")
+    logger.info("Starting translation build from: %s", input_path)
+    logger.info("Output directory: %s", output_path)
     
     # Initialize components
     xml_processor = XMLProcessor()
@@ -34,8 +132,11 @@ def build_command(input_dir: str, output_dir: str = "out") -> None:
         output_dir=output_path,
         openai_api_key=os.environ.get("OPENAI_API_KEY"),
         target_language="Farsi",
-        batch_size=20
+        batch_size=20,
+        max_workers=max_workers,
+        use_batch_api=use_batch_api or bool(resume_batch_ids)
     )
+    config.prepare()
     translator = TranslationService(config)
     
     # Find all stringtable files
@@ -43,94 +144,123 @@ def build_command(input_dir: str, output_dir: str = "out") -> None:
     total_files = len(stringtable_files)
     processed_files = 0
     
-    logger.info(f"Found {total_files} stringtable files to process")
+    logger.info("Found %s stringtable files to process", total_files)
+    
+    # One walk of the output tree instead of an exists()/stat() per input file;
+    # the root-tag sniff keeps failed-translation placeholders out of the set
+    output_root = output_path / "localized" / "it" / "text"
+    completed = {
+        path.relative_to(output_root)
+        for path in output_root.rglob("*.stringtable")
+        if path.stat().st_size > MIN_OUTPUT_SIZE and xml_processor.is_stringtable(path)
+    }
     
+    # Input signatures from previous builds, loaded with a single query
+    file_state = FileStateCache(translator.cache)
+    recorded_states = file_state.load()
+    new_states = []
+    
+    pending = []
     for file_path in stringtable_files:
         # Calculate relative path and output path
         try:
             relative_path = file_path.relative_to(input_path)
         except ValueError:
-            logger.warning(f"Skipping file outside input directory: {file_path}")
+            logger.warning("Skipping file outside input directory: %s", file_path)
             continue
         
         # Map to Italian language slot in output
-        output_file_path = output_path / "localized" / "it" / "text" / relative_path
+        output_file_path = output_root / relative_path
         
-        # CHECK OUTPUT FILE - STRICT SKIPPING
-        if output_file_path.exists() and output_file_path.stat().st_size > 100:
-            # File exists and has reasonable size - skip it
-            logger.info(f"Skipping existing file ({processed_files + 1}/{total_files}): {relative_path}")
-            processed_files += 1
-            continue
-        
-        logger.info(f"Processing ({processed_files + 1}/{total_files}): {relative_path}")
+        input_stat = file_path.stat()
+        state_key = relative_path.as_posix()
+        signature = (input_stat.st_mtime, input_stat.st_size)
+        recorded = recorded_states.get(state_key)
         
-        try:
-            # Parse the XML file
-            entries = xml_processor.parse_stringtable(file_path)
-            
-            if not entries:
-                # Create empty output file for consistency
-                output_file_path.parent.mkdir(parents=True, exist_ok=True)
-                xml_processor.write_stringtable(output_file_path, entries)
-                logger.info(f"Created empty file: {output_file_path}")
+        # CHECK OUTPUT FILE - STRICT SKIPPING
+        if relative_path in completed:
+            if recorded is None or recorded == signature:
+                # Output exists and the input is unchanged (or predates
+                # state tracking) - skip it
+                logger.info("Skipping existing file (%s/%s): %s", processed_files + 1, total_files, relative_path)
                 processed_files += 1
+                if recorded is None:
+                    new_states.append((state_key, *signature, output_file_path.stat().st_mtime))
                 continue
             
-            # Extract texts for translation
-            texts_to_translate = [entry["text"] for entry in entries if entry["text"].strip()]
-            
-            if not texts_to_translate:
-                # No texts to translate, just copy structure
-                translated_entries = entries
-            else:
-                # Translate texts
-                translated_texts = translator.translate_batch(texts_to_translate, batch_size=config.batch_size)
-                
-                # Update entries with translations
-                translated_entries = []
-                text_index = 0
-                for entry in entries:
-                    new_entry = entry.copy()
-                    if entry["text"].strip():
-                        if text_index < len(translated_texts):
-                            new_entry["text"] = translated_texts[text_index]
-                            text_index += 1
-                    translated_entries.append(new_entry)
-            
-            # Ensure output directory exists
-            output_file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Write the translated file
-            xml_processor.write_stringtable(output_file_path, translated_entries)
-            
-            logger.info(f"Completed: {output_file_path}")
+            logger.info("Input changed since last build, retranslating: %s", relative_path)
+        
+        pending.append((file_path, relative_path, output_file_path, signature))
+    
+    # Stringtables share a handful of directories: create each one once
+    # here rather than once per file
+    for output_dir in {output_file_path.parent for _, _, output_file_path, _ in pending}:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    
+    batch_translations = None
+    tables: Dict[Path, Dict[str, List[str]]] = {}
+    if config.use_batch_api and pending:
+        # Submit every pending text as Batch API jobs up front and fill the
+        # files from their results. Going back through the cache would miss
+        # texts it never stores (unchanged or empty translations) and submit
+        # a new job, and wait on it, per file. A job that does not complete
+        # raises here, before any file is written or recorded as done
+        tables = xml_processor.parse_many([file_path for file_path, _, _, _ in pending], soa=True)
+        texts = {
+            text: None
+            for table in tables.values()
+            for text in table["texts"]
+            if text.strip()
+        }
+        unique_texts = list(texts)
+        batch_translations = dict(zip(
+            unique_texts,
+            translator.translate_via_batch_api(
+                unique_texts, batch_size=config.batch_size, batch_ids=resume_batch_ids
+            )
+        ))
+    
+    # Files are independent and translation is network-bound, so threads
+    # overlap the API waits; the translator and its cache are shared
+    executor = ThreadPoolExecutor(max_workers=config.max_workers)
+    try:
+        futures = {
+            executor.submit(
+                _process_one_file, file_path, output_file_path, xml_processor, translator, config,
+                batch_translations, tables.get(file_path)
+            ): (relative_path, output_file_path, signature)
+            for file_path, relative_path, output_file_path, signature in pending
+        }
+        
+        for future in as_completed(futures):
+            relative_path, output_file_path, signature = futures[future]
+            if future.result():
+                new_states.append((relative_path.as_posix(), *signature, output_file_path.stat().st_mtime))
             processed_files += 1
-            
-        except Exception as e:
-            logger.error(f"Failed to process {file_path}: {e}")
-            processed_files += 1  # Count failed files as processed to maintain progress
-            
-            # Create an empty output file to mark as attempted
-            try:
-                output_file_path.parent.mkdir(parents=True, exist_ok=True)
-                output_file_path.write_text(f'<!-- Translation failed: {e} -->')
-                logger.warning(f"Created placeholder file for failed translation: {output_file_path}")
-            except Exception as write_error:
-                logger.error(f"Could not create placeholder file: {write_error}")
-            continue
+            logger.info("Finished (%s/%s): %s", processed_files, total_files, relative_path)
+    except BaseException:
+        # Ctrl-C (or a failure) must stop the build: drop the queued files
+        # rather than translating them all; a rerun skips what was written
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    
+    # One transaction for every file state touched by this build, and
+    # commit any translations still in the cache's write buffer
+    file_state.record(new_states)
+    translator.cache.flush()
     
     success_rate = (processed_files / total_files * 100) if total_files > 0 else 0
-    logger.info(f"Translation build complete! Processed {processed_files}/{total_files} files ({success_rate:.1f}% success rate)")
+    logger.info("Translation build complete! Processed %s/%s files (%.1f%% success rate)", processed_files, total_files, success_rate)
     
     if processed_files < total_files:
         remaining = total_files - processed_files
-        logger.warning(f"{remaining} files were skipped or failed. Check logs for details.")
+        logger.warning("%s files were skipped or failed. Check logs for details.", remaining)
     
     logger.info("="*60)
     logger.info("FARSI LANGUAGE MOD READY FOR INSTALLATION")
     logger.info("="*60)
-    logger.info(f"Output location: {output_path}/localized/it/text/")
+    logger.info("Output location: %s/", output_root)
     logger.info("Installation:")
     logger.info("1. Copy the 'it' folder to your game's localized/ directory")
     logger.info("2. In game: Options → Language → Italiano")
@@ -151,6 +281,9 @@ def main():
     build_parser = subparsers.add_parser("build", help="Build translated files")
     build_parser.add_argument("input_dir", help="Input directory containing English stringtable files")
     build_parser.add_argument("--output", default="out", help="Output directory (default: out)")
+    build_parser.add_argument("--workers", type=int, default=4, help="Number of files translated in parallel (default: 4)")
+    build_parser.add_argument("--batch-api", action="store_true", help="Translate through the OpenAI Batch API (half price, results within 24h)")
+    build_parser.add_argument("--resume-batch", metavar="BATCH_IDS", help="Comma-separated Batch API job IDs logged by an interrupted build to wait on instead of resubmitting")
     
     # Dry run command
     dry_run_parser = subparsers.add_parser("dry-run", help="Show what would be translated")
@@ -176,20 +309,22 @@ def main():
     
     try:
         if args.command == "build":
-            build_command(args.input_dir, args.output)
+            resume_batch_ids = args.resume_batch.split(",") if args.resume_batch else None
+            build_command(args.input_dir, args.output, args.workers, args.batch_api, resume_batch_ids)
         elif args.command == "dry-run":
             # For dry-run, just count files that would be processed
             input_path = Path(args.input_dir).expanduser()
             output_path = Path(args.output)
             
             stringtable_files = list(input_path.rglob("*.stringtable"))
-            existing_count = 0
+            output_root = output_path / "localized" / "it" / "text"
             
-            for file_path in stringtable_files:
-                relative_path = file_path.relative_to(input_path)
-                output_file_path = output_path / "localized" / "it" / "text" / relative_path
-                if output_file_path.exists():
-                    existing_count += 1
+            # One scandir walk of the output tree instead of an exists() per input
+            existing = _scan_stringtables(output_root)
+            existing_count = sum(
+                1 for file_path in stringtable_files
+                if file_path.relative_to(input_path).as_posix() in existing
+            )
             
             to_process = len(stringtable_files) - existing_count
             print(f"Found {len(stringtable_files)} total files")
@@ -206,10 +341,18 @@ def main():
             translated_files = list(output_path.rglob("*.stringtable"))
             print(f"Found {len(translated_files)} translated files")
             
-            # Could add XML validation here
+            # Size check plus root-tag sniff; no full parse needed
+            xml_processor = XMLProcessor()
+            invalid_files = [
+                path for path in translated_files
+                if path.stat().st_size <= MIN_OUTPUT_SIZE or not xml_processor.is_stringtable(path)
+            ]
+            for path in invalid_files:
+                print(f"Invalid or failed translation: {path}")
+            print(f"Valid: {len(translated_files) - len(invalid_files)}, invalid: {len(invalid_files)}")
             
     except Exception as e:
-        logger.error(f"Command failed: {e}")
+        logger.error("Command failed: %s", e)
         return 1
 
 if __name__ == "__main__":
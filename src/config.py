@@ -7,9 +7,9 @@ from pathlib import Path
 from typing import Optional
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration settings for the translation tool."""
+    """Configuration settings for the translation tool (immutable once built)."""
     
     input_dir: Path
     output_dir: Path
@@ -20,6 +20,12 @@ class Config:
     max_retries: int = 2  # Fewer retries to avoid getting stuck
     retry_delay: float = 2.0  # Base delay for retries
     request_timeout: float = 60.0  # 60 second timeout for API requests
+    max_workers: int = 4  # Files translated in parallel
+    max_concurrency: int = 4  # API requests in flight per file
+    requests_per_minute: int = 120  # OpenAI request budget
+    tokens_per_minute: int = 450_000  # OpenAI token budget (prompt + max response)
+    use_batch_api: bool = False  # Submit through the Batch API instead of live requests
+    batch_poll_interval: float = 30.0  # Seconds between Batch API status checks
     
     def __post_init__(self):
         """Validate configuration after initialization."""
@@ -35,5 +41,18 @@ class Config:
         if self.batch_size < 1:
             raise ValueError("Batch size must be at least 1")
         
-        # Create output directory if it doesn't exist
+        if self.max_workers < 1:
+            raise ValueError("Max workers must be at least 1")
+        
+        if self.max_concurrency < 1:
+            raise ValueError("Max concurrency must be at least 1")
+        
+        if self.requests_per_minute < 1 or self.tokens_per_minute < 1:
+            raise ValueError("Rate limits must be at least 1")
+        
+        if self.batch_poll_interval < 0:
+            raise ValueError("Batch poll interval must not be negative")
+    
+    def prepare(self) -> None:
+        """Create the output directory if it doesn't exist."""
         self.output_dir.mkdir(parents=True, exist_ok=True)
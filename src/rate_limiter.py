@@ -0,0 +1,57 @@
+"""
+Token-bucket rate limiting for OpenAI API requests.
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe limiter for requests per minute and tokens per minute.
+    
+    Both budgets refill continuously, so callers only wait when a bucket
+    is actually empty instead of sleeping a fixed interval per request.
+    """
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._available_requests = float(requests_per_minute)
+        self._available_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+    
+    def _refill(self) -> None:
+        """Top up both buckets for the time elapsed (caller holds the lock)."""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        
+        self._available_requests = min(
+            self.requests_per_minute,
+            self._available_requests + elapsed * self.requests_per_minute / 60.0
+        )
+        self._available_tokens = min(
+            self.tokens_per_minute,
+            self._available_tokens + elapsed * self.tokens_per_minute / 60.0
+        )
+    
+    def acquire(self, tokens: int) -> None:
+        """Block until one request and the given number of tokens are available."""
+        # A single request larger than the whole budget waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        
+        while True:
+            with self._lock:
+                self._refill()
+                
+                if self._available_requests >= 1 and self._available_tokens >= tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= tokens
+                    return
+                
+                request_wait = (1 - self._available_requests) * 60.0 / self.requests_per_minute
+                token_wait = (tokens - self._available_tokens) * 60.0 / self.tokens_per_minute
+                wait_time = max(request_wait, token_wait, 0.0)
+            
+            time.sleep(wait_time)
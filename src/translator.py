@@ -3,17 +3,226 @@ Translation service using OpenAI API with caching and glossary support.
 """
 
 import csv
+import hashlib
 import json
 import logging
+import os
 import re
 import time
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
 import tiktoken
 from openai import OpenAI
 
 from .cache import TranslationCache
 from .config import Config
+from .rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+# Response budget per request; also charged against the tokens-per-minute limit
+_MAX_RESPONSE_TOKENS = 3000
+
+# Instructions sent with every batch request
+_SYSTEM_PROMPT = (
+    "You are a professional translator specializing in video game localization. "
+    "Translate the following numbered English texts to Farsi (Persian) while maintaining "
+    "the tone, style, and context appropriate for a fantasy RPG game. "
+    "Preserve any placeholder tokens exactly as they appear. "
+    "Do not translate proper nouns unless they have established Farsi equivalents. "
+    "Maintain the emotional tone and formality level of the original text. "
+    "Return the translations with the same numbers in the format: [1] translation1\\n[2] translation2\\n etc."
+)
+
+# Precedes the newline-separated numbered items in the user message
+_USER_PROMPT_PREFIX = "Translate these texts to Farsi:\n"
+
+# Input tokens packed into one request. Farsi output runs to roughly twice
+# the English token count, so this keeps responses inside _MAX_RESPONSE_TOKENS
+_BATCH_TOKEN_BUDGET = 1200
+
+# Distinct texts whose token counts are remembered per TranslationService
+_TOKEN_COUNT_CACHE_SIZE = 100_000
+
+# Unity-style {variable} and {0}, rich text [tag=value] / [/tag], HTML-style <tag> / </tag>
+_PLACEHOLDER_RE = re.compile(r'\{[^}]+\}|\[[^\]]+\]|<[^>]+>')
+
+# Distinct placeholder-bearing texts whose scans are remembered process-wide
+_PLACEHOLDER_CACHE_SIZE = 4096
+
+# Classifies API errors in one match: a rate-limit marker anywhere wins over a
+# transient-error marker; neither group matching means the error is final
+_RETRY_RE = re.compile(
+    r'(?:(?=.*?(?P<rate>rate limit|too many requests|429))'
+    r'|(?=.*?(?P<transient>timeout|connection|server error|50[023])))?',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Requests the Batch API accepts in one job; larger runs are split across jobs
+_BATCH_JOB_MAX_REQUESTS = 50_000
+
+# Batch job statuses after which a job never changes again
+_BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# Temporary tokens standing in for placeholders while a text is translated
+_TOKEN_RE = re.compile(r'__PLACEHOLDER_\d+__')
+
+# "[n]" prefix of each item in a numbered batch response
+_ITEM_NUMBER_RE = re.compile(r'\[\d+\]')
+_ITEM_PREFIX_RE = re.compile(r'^\[\d+\]\s*')
+
+
+def _read_glossary(glossary_file: Path, key: str) -> Dict[str, str]:
+    """Read a glossary CSV, via its JSON cache when that was written for the same key."""
+    glossary = {}
+    
+    # Parsed glossaries are saved as JSON next to the CSV and reused until the
+    # CSV's path, modification time or size changes. JSON, unlike pickle,
+    # cannot run code from a cache file that came with a downloaded glossary
+    cache_path = glossary_file.with_name(glossary_file.name + ".cache.json")
+    
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as file:
+            cached = json.load(file)
+        cached_glossary = cached["glossary"]
+        if cached["key"] == key and isinstance(cached_glossary, dict):
+            logger.info("Loaded %s entries from glossary cache", len(cached_glossary))
+            return cached_glossary
+    except (OSError, ValueError, TypeError, KeyError):
+        pass
+    
+    try:
+        with open(glossary_file, 'r', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            header = next(reader, [])
+            
+            # Resolve the term columns once from the header
+            if 'english' in header and 'farsi' in header:
+                en_idx, fa_idx = header.index('english'), header.index('farsi')
+            elif 'en' in header and 'fa' in header:
+                en_idx, fa_idx = header.index('en'), header.index('fa')
+            else:
+                en_idx = fa_idx = None
+            
+            if en_idx is not None:
+                min_len = max(en_idx, fa_idx) + 1
+                for row in reader:
+                    if len(row) >= min_len:
+                        glossary[row[en_idx].strip()] = row[fa_idx].strip()
+        
+        logger.info("Loaded %s entries from glossary", len(glossary))
+        
+    except Exception as e:
+        logger.warning("Failed to load glossary: %s", e)
+        return glossary
+    
+    # Write to a temporary file first so concurrent runs never read a partial cache
+    temp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({"key": key, "glossary": glossary}, file, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        logger.debug("Could not write glossary cache %s: %s", cache_path, e)
+    
+    return glossary
+
+
+def _compile_glossary(glossary: Dict[str, str]) -> tuple[Optional[re.Pattern], Dict[str, str]]:
+    """Compile the glossary into one case-insensitive trie regex and a lowercase lookup."""
+    if not glossary:
+        return None, {}
+    
+    # Longest terms first so the first of several same-spelling terms wins
+    sorted_terms = sorted(glossary, key=len, reverse=True)
+    lookup = {}
+    for english_term in sorted_terms:
+        lookup.setdefault(english_term.lower(), glossary[english_term])
+    
+    # Terms sharing a prefix share a branch, so matching cost follows the
+    # text rather than the glossary size
+    trie: Dict[str, dict] = {}
+    for term in lookup:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    pattern = re.compile(r'\b' + _trie_pattern(trie) + r'\b', re.IGNORECASE)
+    return pattern, lookup
+
+
+@lru_cache(maxsize=8)
+def _load_compiled_glossary(
+    path: str, mtime_ns: int, size: int
+) -> tuple[Dict[str, str], Optional[re.Pattern], Dict[str, str]]:
+    """Read and compile a glossary once per file version for the whole process."""
+    glossary = _read_glossary(Path(path), f"{path}-{mtime_ns}-{size}")
+    return (glossary, *_compile_glossary(glossary))
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """Render a character trie ("" marks a term end) as a regex preferring the longest term."""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in node.items() if char]
+    if not branches:
+        return ""
+    if len(branches) == 1 and "" not in node:
+        return branches[0]
+    
+    # Greedy "?" tries the longer continuation before ending the term here
+    group = "(?:" + "|".join(branches) + ")"
+    return group + "?" if "" in node else group
+
+
+def _may_have_placeholders(text: str) -> bool:
+    """Cheap pre-check: every placeholder opens with one of these characters.
+    
+    Most dialogue lines contain none, and substring tests are plain memchr
+    scans (~10x faster than a findall miss), so those lines skip the regex engine.
+    """
+    return "{" in text or "[" in text or "<" in text
+
+
+@lru_cache(maxsize=_PLACEHOLDER_CACHE_SIZE)
+def _find_placeholders(text: str) -> tuple[str, ...]:
+    """Placeholders in a text, in order of appearance."""
+    return tuple(_PLACEHOLDER_RE.findall(text))
+
+
+@lru_cache(maxsize=_PLACEHOLDER_CACHE_SIZE)
+def _tokenize_placeholders(text: str) -> tuple[str, tuple[tuple[str, str], ...]]:
+    """Replace a text's placeholders with numbered tokens.
+    
+    Returns the tokenized text and its (token, placeholder) pairs; both are
+    immutable, so cached results can be shared between callers.
+    """
+    placeholder_map = {}
+    
+    # Number tokens in match order during a single substitution pass
+    def to_token(match: re.Match) -> str:
+        token = f"__PLACEHOLDER_{len(placeholder_map)}__"
+        placeholder_map[token] = match.group(0)
+        return token
+    
+    return _PLACEHOLDER_RE.sub(to_token, text), tuple(placeholder_map.items())
+
+
+def _batch_custom_id(n: int, messages: List[Dict[str, str]]) -> str:
+    """Name a Batch API request by its position and a digest of its prompt.
+    
+    The digest lets results from a resumed job be matched to this run's
+    requests, and skipped if the pending texts have changed since.
+    """
+    digest = hashlib.blake2b(messages[-1]["content"].encode("utf-8"), digest_size=8).hexdigest()
+    return f"batch-{n}-{digest}"
+
+
+class BatchJobError(RuntimeError):
+    """A Batch API job failed, expired or was cancelled before producing its results."""
 
 
 class TranslationService:
@@ -32,113 +241,85 @@ class TranslationService:
         self.client = OpenAI(api_key=config.openai_api_key)
         self.model = "gpt-4o"
         
-        # Initialize tokenizer for cost estimation
-        self.tokenizer = tiktoken.encoding_for_model(self.model)
+        # Token counts are memoized per instance since the same texts are
+        # estimated repeatedly; the tokenizer itself is loaded on first use
+        self._count_tokens = lru_cache(maxsize=_TOKEN_COUNT_CACHE_SIZE)(self._encode_length)
         
         # Initialize cache
         self.cache = TranslationCache()
         
         # Load glossary if provided
-        self.glossary = self._load_glossary()
+        self.glossary, self._glossary_re, self._glossary_lookup = self._load_glossary()
         
-        # Rate limiting
-        self.last_request_time = 0
-        self.min_request_interval = 0.5  # More reasonable 0.5 seconds between requests
+        # Rate limiting (shared by all worker threads)
+        self.rate_limiter = RateLimiter(config.requests_per_minute, config.tokens_per_minute)
     
-    def _load_glossary(self) -> Dict[str, str]:
-        """Load glossary from CSV file."""
-        glossary = {}
-        
-        if not self.config.glossary_file or not self.config.glossary_file.exists():
-            return glossary
+    @cached_property
+    def tokenizer(self) -> Optional[tiktoken.Encoding]:
+        """Tokenizer for cost estimation, loaded on first use (it reads a ~1 MB BPE file).
         
+        None if it cannot be loaded (e.g. offline with no cached BPE file); the
+        failure is remembered so it is not retried, possibly over the network, per text.
+        """
         try:
-            with open(self.config.glossary_file, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if 'english' in row and 'farsi' in row:
-                        glossary[row['english'].strip()] = row['farsi'].strip()
-                    elif 'en' in row and 'fa' in row:
-                        glossary[row['en'].strip()] = row['fa'].strip()
-            
-            self.logger.info(f"Loaded {len(glossary)} entries from glossary")
-            
+            return tiktoken.encoding_for_model(self.model)
         except Exception as e:
-            self.logger.warning(f"Failed to load glossary: {e}")
-        
-        return glossary
+            self.logger.warning("Tokenizer unavailable, estimating tokens from text length: %s", e)
+            return None
+    
+    def _load_glossary(self) -> tuple[Dict[str, str], Optional[re.Pattern], Dict[str, str]]:
+        """Load and compile the glossary, shared by every service using the same file version."""
+        glossary_file = self.config.glossary_file
+        if not glossary_file or not glossary_file.exists():
+            return {}, None, {}
+        
+        stat = glossary_file.stat()
+        return _load_compiled_glossary(str(glossary_file.resolve()), stat.st_mtime_ns, stat.st_size)
     
     def _extract_placeholders(self, text: str) -> List[str]:
         """Extract placeholders from text (e.g., {PlayerName}, [color=red], etc.)."""
-        placeholders = []
-        
-        # Unity-style placeholders: {variable}
-        placeholders.extend(re.findall(r'\{[^}]+\}', text))
-        
-        # Rich text tags: [tag=value], [/tag]
-        placeholders.extend(re.findall(r'\[[^\]]+\]', text))
-        
-        # HTML-style tags: <tag>, </tag>
-        placeholders.extend(re.findall(r'<[^>]+>', text))
-        
-        # Numbered placeholders: {0}, {1}, etc.
-        placeholders.extend(re.findall(r'\{\d+\}', text))
-        
-        return placeholders
+        if not _may_have_placeholders(text):
+            return []
+        return list(_find_placeholders(text))
     
     def _replace_placeholders_with_tokens(self, text: str) -> tuple[str, Dict[str, str]]:
         """Replace placeholders with temporary tokens for translation."""
-        placeholders = self._extract_placeholders(text)
-        placeholder_map = {}
-        modified_text = text
-        
-        for i, placeholder in enumerate(placeholders):
-            token = f"__PLACEHOLDER_{i}__"
-            placeholder_map[token] = placeholder
-            modified_text = modified_text.replace(placeholder, token, 1)
-        
-        return modified_text, placeholder_map
+        # Placeholder-free lines (most of them) stay out of the memo
+        if not _may_have_placeholders(text):
+            return text, {}
+        text_with_tokens, pairs = _tokenize_placeholders(text)
+        return text_with_tokens, dict(pairs)
     
     def _restore_placeholders(self, text: str, placeholder_map: Dict[str, str]) -> str:
         """Restore placeholders from temporary tokens."""
-        for token, placeholder in placeholder_map.items():
-            text = text.replace(token, placeholder)
-        return text
+        if not placeholder_map:
+            return text
+        return _TOKEN_RE.sub(lambda m: placeholder_map.get(m.group(0), m.group(0)), text)
     
     def _apply_glossary(self, text: str) -> str:
         """Apply glossary translations to text."""
-        if not self.glossary:
+        if self._glossary_re is None:
             return text
         
-        # Sort by length (longest first) to avoid partial replacements
-        sorted_terms = sorted(self.glossary.keys(), key=len, reverse=True)
-        
-        for english_term in sorted_terms:
-            farsi_term = self.glossary[english_term]
-            # Use word boundaries to avoid partial matches
-            pattern = r'\b' + re.escape(english_term) + r'\b'
-            text = re.sub(pattern, farsi_term, text, flags=re.IGNORECASE)
-        
-        return text
-    
-    def _rate_limit(self):
-        """Implement rate limiting for API requests."""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        
-        if time_since_last_request < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last_request
-            time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
+        # One left-to-right scan for every term; matches never overlap
+        lookup = self._glossary_lookup
+        return self._glossary_re.sub(lambda m: lookup.get(m.group(0).lower(), m.group(0)), text)
     
     def estimate_tokens(self, text: str) -> int:
-        """Estimate the number of tokens for a text."""
-        try:
-            return len(self.tokenizer.encode(text))
-        except Exception:
-            # Fallback estimation: roughly 4 characters per token
-            return len(text) // 4
+        """Estimate the number of tokens for a text (memoized per distinct text)."""
+        return self._count_tokens(text)
+    
+    def _encode_length(self, text: str) -> int:
+        """Count a text's tokens with the model tokenizer."""
+        tokenizer = self.tokenizer
+        if tokenizer is not None:
+            try:
+                return len(tokenizer.encode(text))
+            except Exception:
+                pass
+        
+        # Fallback estimation: roughly 4 characters per token
+        return len(text) // 4
     
     def estimate_cost(self, total_tokens: int) -> float:
         """Estimate the cost based on token count."""
@@ -148,6 +329,14 @@ class TranslationService:
         output_cost = (total_tokens / 1_000_000) * 15.00
         return input_cost + output_cost
     
+    def estimate_batch_cost(self, texts: Iterable[str]) -> float:
+        """Estimate the cost of translating many texts with a single cost calculation.
+        
+        Token counts (memoized, so repeated texts are not re-encoded) are
+        summed and priced once, rather than pricing each text separately.
+        """
+        return self.estimate_cost(sum(map(self.estimate_tokens, texts)))
+    
     def translate_text(self, text: str) -> str:
         """Translate a single text string."""
         if not text or not text.strip():
@@ -156,7 +345,7 @@ class TranslationService:
         # Check cache first - but only use cache for exact matches
         cached_translation = self.cache.get_translation(text)
         if cached_translation and len(cached_translation.strip()) > 0:
-            self.logger.debug(f"Using cached translation for: {text[:30]}...")
+            self.logger.debug("Using cached translation for: %s...", text[:30])
             return cached_translation
         
         # For single text, use batch processing with size 1
@@ -165,42 +354,60 @@ class TranslationService:
     
 
 
+    def _prepare_batch(self, texts: List[str]) -> tuple[List[str], List[Dict[str, str]]]:
+        """Number texts for a batch prompt, tokenizing placeholders and applying the glossary."""
+        # Extract placeholders, then apply the glossary to the tokenized text
+        prepared = [self._replace_placeholders_with_tokens(text) for text in texts]
+        batch_items = [
+            f"[{number}] {self._apply_glossary(text_with_tokens)}"
+            for number, (text_with_tokens, _) in enumerate(prepared, 1)
+        ]
+        placeholder_maps = [placeholder_map for _, placeholder_map in prepared]
+        
+        return batch_items, placeholder_maps
+    
+    def _build_messages(self, batch_items: List[str]) -> List[Dict[str, str]]:
+        """Build the chat messages asking for a numbered batch to be translated."""
+        return [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": _USER_PROMPT_PREFIX + "\n".join(batch_items)}
+        ]
+    
     def _translate_batch_internal(self, texts: List[str]) -> List[str]:
         """Internal method to translate multiple texts in a single API call."""
         if not texts:
             return []
         
-        # Separate texts that need translation from cached ones
-        texts_to_translate = []
+        # Separate texts that need translation from cached ones; repeated
+        # texts are sent once and their translation fanned out to every index
+        texts_to_translate: Dict[str, List[int]] = {}
         results: List[str] = [""] * len(texts)
         
+        # Look up every text in one round-trip instead of one query per text
+        cached = self.cache.get_translations_bulk([text for text in texts if text and text.strip()])
+        
         for i, text in enumerate(texts):
             if not text or not text.strip():
                 results[i] = text
                 continue
                 
-            cached_translation = self.cache.get_translation(text)
-            if cached_translation and len(cached_translation.strip()) > 0:
+            cached_translation = cached.get(text)
+            if cached_translation:
                 results[i] = cached_translation
-                self.logger.debug(f"Using cached translation for: {text[:30]}...")
+                self.logger.debug("Using cached translation for: %s...", text[:30])
             else:
-                texts_to_translate.append((i, text))
+                texts_to_translate.setdefault(text, []).append(i)
         
         # If no texts need translation, return cached results
         if not texts_to_translate:
             return results
         
         # Prepare batch translation
-        batch_items = []
-        placeholder_maps = {}
+        unique_texts = list(texts_to_translate)
+        batch_items, placeholder_maps = self._prepare_batch(unique_texts)
         
-        for idx, text in texts_to_translate:
-            # Extract placeholders and apply glossary
-            text_with_tokens, placeholder_map = self._replace_placeholders_with_tokens(text)
-            text_with_glossary = self._apply_glossary(text_with_tokens)
-            
-            batch_items.append(f"[{len(batch_items) + 1}] {text_with_glossary}")
-            placeholder_maps[len(batch_items) - 1] = placeholder_map
+        # Prepare batch translation prompt once; retries resend it unchanged
+        messages = self._build_messages(batch_items)
         
         # Retry logic for rate limits and transient errors
         max_retries = self.config.max_retries
@@ -208,31 +415,20 @@ class TranslationService:
         
         for attempt in range(max_retries + 1):
             try:
-                # Rate limiting
-                self._rate_limit()
-                
-                # Prepare batch translation prompt
-                system_prompt = (
-                    "You are a professional translator specializing in video game localization. "
-                    "Translate the following numbered English texts to Farsi (Persian) while maintaining "
-                    "the tone, style, and context appropriate for a fantasy RPG game. "
-                    "Preserve any placeholder tokens exactly as they appear. "
-                    "Do not translate proper nouns unless they have established Farsi equivalents. "
-                    "Maintain the emotional tone and formality level of the original text. "
-                    "Return the translations with the same numbers in the format: [1] translation1\\n[2] translation2\\n etc."
+                # Rate limiting: wait for a request slot and the token budget
+                # (prompt plus the maximum response). The prompt is costed per
+                # item so repeated texts and retries hit the token-count cache
+                self.rate_limiter.acquire(
+                    self.estimate_tokens(_SYSTEM_PROMPT)
+                    + sum(self.estimate_tokens(item) for item in batch_items)
+                    + _MAX_RESPONSE_TOKENS
                 )
                 
-                batch_text = "\n".join(batch_items)
-                user_prompt = f"Translate these texts to Farsi:\n{batch_text}"
-                
                 # Make API request with timeout
                 response = self.client.chat.completions.create(
                     model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    max_tokens=3000,  # Smaller for faster response
+                    messages=messages,
+                    max_tokens=_MAX_RESPONSE_TOKENS,  # Smaller for faster response
                     temperature=0.3,
                     timeout=self.config.request_timeout  # Add timeout to prevent hanging
                 )
@@ -241,35 +437,35 @@ class TranslationService:
                 break
                 
             except Exception as e:
-                error_msg = str(e).lower()
+                retry = _RETRY_RE.match(str(e))
                 
                 # Check if it's a rate limit error
-                if "rate limit" in error_msg or "too many requests" in error_msg or "429" in error_msg:
+                if retry.group("rate"):
                     if attempt < max_retries:
                         wait_time = min(10.0, self.config.retry_delay * (attempt + 1))  # Cap wait time at 10 seconds
-                        self.logger.warning(f"Rate limit hit. Waiting {wait_time}s before retry {attempt + 1}/{max_retries}")
+                        self.logger.warning("Rate limit hit. Waiting %ss before retry %s/%s", wait_time, attempt + 1, max_retries)
                         time.sleep(wait_time)
                         continue
                     else:
-                        self.logger.error(f"Rate limit exceeded after {max_retries} retries")
+                        self.logger.error("Rate limit exceeded after %s retries", max_retries)
                         # Don't raise - continue with original text to avoid complete failure
                         break
                 
                 # Check for other retryable errors
-                elif any(err in error_msg for err in ["timeout", "connection", "server error", "503", "502", "500"]):
+                elif retry.group("transient"):
                     if attempt < max_retries:
                         wait_time = min(5.0, self.config.retry_delay * (attempt + 1))  # Cap at 5 seconds
-                        self.logger.warning(f"Transient error: {e}. Retrying in {wait_time}s...")
+                        self.logger.warning("Transient error: %s. Retrying in %ss...", e, wait_time)
                         time.sleep(wait_time)
                         continue
                     else:
-                        self.logger.error(f"Request failed after {max_retries} retries: {e}")
+                        self.logger.error("Request failed after %s retries: %s", max_retries, e)
                         # Don't raise - continue with original text to avoid complete failure
                         break
                 
                 # Non-retryable error
                 else:
-                    self.logger.error(f"Non-retryable error: {e}")
+                    self.logger.error("Non-retryable error: %s", e)
                     # Don't raise - continue with original text to avoid complete failure
                     break
         
@@ -281,34 +477,40 @@ class TranslationService:
                     raise Exception("Empty response from API")
                 
                 # Parse batch response
-                translated_texts = self._parse_batch_response(batch_response, len(texts_to_translate))
+                translated_texts = self._parse_batch_response(batch_response, len(unique_texts))
                 
-                # Process translated texts and cache them
-                for i, (original_idx, original_text) in enumerate(texts_to_translate):
+                # Process translated texts and cache them in one transaction
+                to_cache = []
+                for i, original_text in enumerate(unique_texts):
                     if i < len(translated_texts):
                         translated_text = translated_texts[i]
                         # Restore placeholders
                         translated_text = self._restore_placeholders(translated_text, placeholder_maps[i])
-                        # Cache the translation
-                        self.cache.store_translation(original_text, translated_text)
-                        results[original_idx] = translated_text
-                        self.logger.debug(f"Translated: {original_text[:30]}... -> {translated_text[:30]}...")
+                        to_cache.append((original_text, translated_text))
+                        self.logger.debug("Translated: %s... -> %s...", original_text[:30], translated_text[:30])
                     else:
                         # Fallback to original text if parsing failed
-                        results[original_idx] = original_text
-                        self.logger.warning(f"Failed to parse translation for: {original_text[:30]}...")
+                        translated_text = original_text
+                        self.logger.warning("Failed to parse translation for: %s...", original_text[:30])
+                    
+                    for original_idx in texts_to_translate[original_text]:
+                        results[original_idx] = translated_text
+                
+                self.cache.store_translations(to_cache)
                 
             except Exception as e:
-                self.logger.error(f"Error processing response: {e}")
+                self.logger.error("Error processing response: %s", e)
                 # Fallback: use original texts for untranslated items
-                for original_idx, original_text in texts_to_translate:
-                    if not results[original_idx]:
-                        results[original_idx] = original_text
+                for original_text, indices in texts_to_translate.items():
+                    for original_idx in indices:
+                        if not results[original_idx]:
+                            results[original_idx] = original_text
         else:
             # No successful response after all retries
             self.logger.error("No successful response received after all retries")
-            for original_idx, original_text in texts_to_translate:
-                results[original_idx] = original_text
+            for original_text, indices in texts_to_translate.items():
+                for original_idx in indices:
+                    results[original_idx] = original_text
         
         return results
     
@@ -317,26 +519,22 @@ class TranslationService:
         translations = []
         lines = response.strip().split('\n')
         
-        current_translation = ""
+        # Lines of the current item, joined once when the item ends
+        current_parts: List[str] = []
         for line in lines:
             line = line.strip()
-            if re.match(r'\[\d+\]', line):  # New numbered item
-                if current_translation:
+            if _ITEM_NUMBER_RE.match(line):  # New numbered item
+                if current_parts:
                     # Remove the number prefix and clean up
-                    clean_translation = re.sub(r'^\[\d+\]\s*', '', current_translation).strip()
-                    translations.append(clean_translation)
-                current_translation = line
-            else:
+                    translations.append(_ITEM_PREFIX_RE.sub('', " ".join(current_parts)).strip())
+                current_parts = [line]
+            elif line or current_parts:
                 # Continuation of current translation
-                if current_translation:
-                    current_translation += " " + line
-                else:
-                    current_translation = line
+                current_parts.append(line)
         
         # Add the last translation
-        if current_translation:
-            clean_translation = re.sub(r'^\[\d+\]\s*', '', current_translation).strip()
-            translations.append(clean_translation)
+        if current_parts:
+            translations.append(_ITEM_PREFIX_RE.sub('', " ".join(current_parts)).strip())
         
         # Ensure we have the expected number of translations
         while len(translations) < expected_count:
@@ -344,19 +542,180 @@ class TranslationService:
         
         return translations[:expected_count]
     
+    def translate_via_batch_api(
+        self,
+        texts: List[str],
+        batch_size: int = 20,
+        batch_ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Translate texts through the OpenAI Batch API (half price, 24h completion window).
+        
+        Cached texts are answered immediately; the rest are packed into
+        prompts as for translate_batch, submitted as jobs of at most
+        _BATCH_JOB_MAX_REQUESTS requests and polled until they finish. Passing
+        the job IDs logged by an earlier run waits on those jobs instead of
+        submitting (and paying for) new ones.
+        Blank texts, and texts a finished job leaves untranslated, are returned
+        unchanged. Raises BatchJobError if a job does not complete.
+        """
+        if not texts:
+            return []
+        
+        # Blank texts are never sent (or paid for), as in _translate_batch_internal
+        texts_to_translate = [text for text in texts if text and text.strip()]
+        cached = self.cache.get_translations_bulk(texts_to_translate)
+        pending = [text for text in dict.fromkeys(texts_to_translate) if text not in cached]
+        
+        if pending:
+            groups = [[pending[i] for i in indices] for indices in self._pack_batches(pending, batch_size)]
+            prepared = [self._prepare_batch(group) for group in groups]
+            
+            lines = []
+            group_numbers = {}
+            for n, (batch_items, _) in enumerate(prepared):
+                messages = self._build_messages(batch_items)
+                custom_id = _batch_custom_id(n, messages)
+                group_numbers[custom_id] = n
+                lines.append(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.model,
+                        "messages": messages,
+                        "max_tokens": _MAX_RESPONSE_TOKENS,
+                        "temperature": 0.3
+                    }
+                }, ensure_ascii=False))
+            
+            if batch_ids:
+                jobs = [self.client.batches.retrieve(batch_id) for batch_id in batch_ids]
+                self.logger.info("Resuming batch jobs %s (%s texts)", ", ".join(batch_ids), len(pending))
+            else:
+                jobs = [
+                    self._submit_batch_job(lines[start:start + _BATCH_JOB_MAX_REQUESTS])
+                    for start in range(0, len(lines), _BATCH_JOB_MAX_REQUESTS)
+                ]
+                # Jobs are billed once submitted; log them before the long wait
+                # so an interrupted run can pick them up instead of resubmitting
+                self.logger.warning(
+                    "Waiting for batch jobs (%s texts); if this run stops, resume with --resume-batch %s",
+                    len(pending), ",".join(job.id for job in jobs)
+                )
+            
+            jobs = [self._wait_for_batch_job(job) for job in jobs]
+            
+            to_cache = []
+            for job in jobs:
+                if not job.output_file_id:
+                    continue
+                output = self.client.files.content(job.output_file_id).text
+                
+                for line in output.splitlines():
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                        n = group_numbers[record["custom_id"]]
+                        content = record["response"]["body"]["choices"][0]["message"]["content"]
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        self.logger.warning("Skipping unreadable or unmatched batch result line: %s", e)
+                        continue
+                    
+                    group = groups[n]
+                    placeholder_maps = prepared[n][1]
+                    for i, translated_text in enumerate(self._parse_batch_response(content, len(group))):
+                        if translated_text:
+                            to_cache.append((group[i], self._restore_placeholders(translated_text, placeholder_maps[i])))
+            
+            # Keep whatever finished jobs produced, even if another job failed
+            self.cache.store_translations(to_cache)
+            cached.update(to_cache)
+            
+            unfinished = [job for job in jobs if job.status != "completed" or not job.output_file_id]
+            if unfinished:
+                raise BatchJobError("Batch jobs did not complete: " + ", ".join(
+                    f"{job.id} ({job.status})" for job in unfinished
+                ))
+            
+            missing = len(pending) - len(to_cache)
+            if missing:
+                self.logger.warning("Batch jobs left %s texts untranslated", missing)
+        
+        return [cached.get(text, text) for text in texts]
+    
+    def _submit_batch_job(self, lines: List[str]):
+        """Upload JSONL request lines and start a Batch API job for them."""
+        input_file = self.client.files.create(
+            file=("translations.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        job = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        self.logger.info("Submitted batch job %s (%s requests)", job.id, len(lines))
+        return job
+    
+    def _wait_for_batch_job(self, job):
+        """Poll a Batch API job until it reaches a final status."""
+        while job.status not in _BATCH_FINAL_STATUSES:
+            time.sleep(self.config.batch_poll_interval)
+            job = self.client.batches.retrieve(job.id)
+            self.logger.debug("Batch job %s: %s", job.id, job.status)
+        return job
+    
     def translate_batch(self, texts: List[str], batch_size: int = 20) -> List[str]:
         """Translate a batch of texts with configurable batch size."""
         if not texts:
             return []
         
-        all_results = []
+        if self.config.use_batch_api:
+            return self.translate_via_batch_api(texts, batch_size)
         
-        # Process in chunks
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            self.logger.info(f"Processing batch {i // batch_size + 1}/{(len(texts) + batch_size - 1) // batch_size} ({len(batch)} items)")
-            
-            batch_results = self._translate_batch_internal(batch)
-            all_results.extend(batch_results)
+        # Translate each distinct text once, so repeats never span batches
+        unique_texts = list(dict.fromkeys(texts))
+        if len(unique_texts) < len(texts):
+            translated = dict(zip(unique_texts, self.translate_batch(unique_texts, batch_size)))
+            return [translated[text] for text in texts]
+        
+        # Pack into token-budgeted chunks
+        index_batches = self._pack_batches(texts, batch_size)
+        batches = [[texts[i] for i in indices] for indices in index_batches]
+        self.logger.info("Processing %s batches (%s items)", len(batches), len(texts))
+        
+        if len(batches) == 1:
+            return self._translate_batch_internal(batches[0])
+        
+        # Requests are network-bound: keep several in flight and let the
+        # shared rate limiter pace them; map() preserves batch order
+        all_results: List[str] = [""] * len(texts)
+        with ThreadPoolExecutor(max_workers=self.config.max_concurrency) as executor:
+            for indices, batch_results in zip(index_batches, executor.map(self._translate_batch_internal, batches)):
+                for i, translated_text in zip(indices, batch_results):
+                    all_results[i] = translated_text
         
         return all_results
+    
+    def _pack_batches(self, texts: List[str], batch_size: int) -> List[List[int]]:
+        """Group text indices into batches of at most batch_size texts and about _BATCH_TOKEN_BUDGET tokens.
+        
+        Texts are packed longest first, so each batch holds texts of similar
+        length; a text over the budget on its own gets a batch to itself.
+        """
+        counts = [self.estimate_tokens(text) for text in texts]
+        
+        batches = []
+        current: List[int] = []
+        current_tokens = 0
+        for i in sorted(range(len(texts)), key=counts.__getitem__, reverse=True):
+            if current and (len(current) >= batch_size or current_tokens + counts[i] > _BATCH_TOKEN_BUDGET):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += counts[i]
+        
+        if current:
+            batches.append(current)
+        return batches
@@ -2,10 +2,70 @@
 XML utilities for parsing and writing .stringtable files.
 """
 
+import hashlib
 import logging
-import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Union
+from xml.sax.saxutils import escape
+
+try:
+    from lxml import etree as ET
+    _HAVE_LXML = True
+except ImportError:  # stdlib fallback; lxml is the declared dependency
+    import xml.etree.ElementTree as ET
+    _HAVE_LXML = False
+
+
+# A stringtable's entries: [{"id", "text"}, ...] or {"ids": [...], "texts": [...]}
+Entries = Union[List[Dict[str, str]], Dict[str, List[str]]]
+
+# Namespaces declared on every StringTableFile root
+_STRINGTABLE_NSMAP = {
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+    "xsd": "http://www.w3.org/2001/XMLSchema",
+}
+
+# Bytes read per step when sniffing a file's root tag
+_SNIFF_CHUNK_SIZE = 4096
+
+# Written ahead of every stringtable's entries; laid out like the game's own files
+_STRINGTABLE_HEADER = (
+    '<?xml version="1.0" encoding="utf-8"?>\n<StringTableFile'
+    + "".join(f' xmlns:{prefix}="{uri}"' for prefix, uri in _STRINGTABLE_NSMAP.items())
+    + ">\n"
+)
+
+
+def _escape_text(text: str) -> str:
+    """Escape character data, keeping carriage returns as character references."""
+    return escape(text, {"\r": "&#13;"})
+
+
+def _entry_id(element: "ET.Element", standard: bool) -> str:
+    """Read an Entry's ID from its <ID> child, or from an ID attribute in older or generic files."""
+    if standard:
+        entry_id = element.findtext("ID")
+        if entry_id is not None:
+            return entry_id
+        return element.get("ID", "")
+    return element.get("ID", element.get("id", ""))
+
+
+def _parse_one(file_path: Path, soa: bool = False) -> tuple[Path, Optional[Entries]]:
+    """Parse one file in a worker process; None marks a file that could not be parsed."""
+    try:
+        processor = XMLProcessor()
+        if soa:
+            return file_path, processor.parse_stringtable_soa(file_path)
+        return file_path, processor.parse_stringtable(file_path)
+    except Exception:
+        return file_path, None
+
+
+def _write_one(item: tuple[Path, Entries]) -> None:
+    """Write one file in a worker process."""
+    XMLProcessor().write_stringtable(*item)
 
 
 class XMLProcessor:
@@ -14,122 +74,236 @@ class XMLProcessor:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
     
+    def _iter_entries(self, file_path: Path) -> Iterator[tuple[bool, "ET.Element"]]:
+        """Stream a stringtable's closed Entry elements, each with whether the root is a StringTableFile.
+        
+        Each entry is cleared once the caller moves past it, so only one
+        entry's subtree is held at a time.
+        """
+        if _HAVE_LXML:
+            # lxml filters on the tag in C, so Python only sees Entry end events
+            standard = None
+            for _, element in ET.iterparse(str(file_path), events=("end",), tag="Entry", huge_tree=True):
+                if standard is None:
+                    standard = element.getroottree().getroot().tag == "StringTableFile"
+                yield standard, element
+                
+                # Free the entry and any already-processed siblings
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+            return
+        
+        standard = None
+        # Elements opened but not yet closed; the last one is the parent of the next closed element
+        open_elements = []
+        for event, element in ET.iterparse(str(file_path), events=("start", "end")):
+            if event == "start":
+                if standard is None:
+                    # The first event is the root's start tag
+                    standard = element.tag == "StringTableFile"
+                open_elements.append(element)
+                continue
+            
+            open_elements.pop()
+            if element.tag == "Entry":
+                yield standard, element
+                
+                # Free the entry and detach it and any already-processed siblings
+                element.clear()
+                if open_elements:
+                    del open_elements[-1][:]
+    
     def parse_stringtable(self, file_path: Path) -> List[Dict[str, str]]:
         """Parse a .stringtable XML file and extract entries."""
         try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            
             entries = []
             
-            # Handle different XML structures
-            if root.tag == "StringTableFile":
-                # Standard Pillars of Eternity format
-                for entry in root.findall(".//Entry"):
+            for standard, element in self._iter_entries(file_path):
+                if standard:
+                    # Standard Pillars of Eternity format
                     entry_data = {
-                        "id": entry.get("ID", ""),
+                        "id": _entry_id(element, standard),
                         "text": ""
                     }
                     
                     # Find DefaultText element
-                    default_text = entry.find("DefaultText")
+                    default_text = element.find("DefaultText")
                     if default_text is not None and default_text.text:
                         entry_data["text"] = default_text.text
-                    
-                    entries.append(entry_data)
-            
-            else:
-                # Try to parse generic structure
-                for entry in root.findall(".//Entry"):
+                
+                else:
+                    # Try to parse generic structure
                     entry_data = {
-                        "id": entry.get("ID", entry.get("id", "")),
-                        "text": entry.text or ""
+                        "id": _entry_id(element, standard),
+                        "text": element.text or ""
                     }
-                    entries.append(entry_data)
+                
+                entries.append(entry_data)
             
-            self.logger.debug(f"Parsed {len(entries)} entries from {file_path}")
+            self.logger.debug("Parsed %s entries from %s", len(entries), file_path)
             return entries
             
         except ET.ParseError as e:
-            self.logger.error(f"XML parsing error in {file_path}: {e}")
+            self.logger.error("XML parsing error in %s: %s", file_path, e)
             raise
         except Exception as e:
-            self.logger.error(f"Error parsing {file_path}: {e}")
+            self.logger.error("Error parsing %s: %s", file_path, e)
             raise
     
-    def write_stringtable(self, file_path: Path, entries: List[Dict[str, str]]) -> None:
-        """Write entries to a .stringtable XML file."""
+    def parse_stringtable_soa(self, file_path: Path) -> Dict[str, List[str]]:
+        """Parse a .stringtable into parallel lists: {"ids": [...], "texts": [...]}.
+        
+        Same entries as parse_stringtable, without a dict per entry.
+        """
         try:
-            # Create root element
-            root = ET.Element("StringTableFile")
-            root.set("xmlns:xsi", "http://www.w3.org/2001/XMLSchema-instance")
-            root.set("xmlns:xsd", "http://www.w3.org/2001/XMLSchema")
-            
-            # Add Name element (use filename without extension)
-            name_elem = ET.SubElement(root, "Name")
-            name_elem.text = file_path.stem
-            
-            # Add NextEntryID (use number of entries + 1)
-            next_id_elem = ET.SubElement(root, "NextEntryID")
-            next_id_elem.text = str(len(entries) + 1)
-            
-            # Add EntryCount
-            count_elem = ET.SubElement(root, "EntryCount")
-            count_elem.text = str(len(entries))
-            
-            # Add Entries container
-            entries_elem = ET.SubElement(root, "Entries")
-            
-            # Add each entry
-            for entry in entries:
-                entry_elem = ET.SubElement(entries_elem, "Entry")
-                entry_elem.set("ID", str(entry.get("id", "")))
-                
-                # Add DefaultText
-                default_text_elem = ET.SubElement(entry_elem, "DefaultText")
-                default_text_elem.text = entry.get("text", "")
-                
-                # Add FemaleText (copy from DefaultText for consistency)
-                female_text_elem = ET.SubElement(entry_elem, "FemaleText")
-                female_text_elem.text = entry.get("text", "")
+            ids = []
+            texts = []
+            
+            for standard, element in self._iter_entries(file_path):
+                ids.append(_entry_id(element, standard))
+                if standard:
+                    default_text = element.find("DefaultText")
+                    texts.append((default_text.text or "") if default_text is not None else "")
+                else:
+                    texts.append(element.text or "")
             
-            # Create the tree and write to file
-            tree = ET.ElementTree(root)
+            self.logger.debug("Parsed %s entries from %s", len(ids), file_path)
+            return {"ids": ids, "texts": texts}
+            
+        except ET.ParseError as e:
+            self.logger.error("XML parsing error in %s: %s", file_path, e)
+            raise
+        except Exception as e:
+            self.logger.error("Error parsing %s: %s", file_path, e)
+            raise
+    
+    def parse_many(
+        self,
+        file_paths: List[Path],
+        max_workers: Optional[int] = None,
+        soa: bool = False
+    ) -> Dict[Path, Entries]:
+        """Parse many stringtables in parallel worker processes.
+        
+        With soa=True each file is parsed as by parse_stringtable_soa.
+        Files that fail to parse are logged and left out of the result.
+        """
+        if len(file_paths) < 2:
+            parsed = [_parse_one(file_path, soa) for file_path in file_paths]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                parsed = list(executor.map(_parse_one, file_paths, [soa] * len(file_paths), chunksize=4))
+        
+        results = {}
+        for file_path, entries in parsed:
+            if entries is None:
+                self.logger.error("Error parsing %s", file_path)
+            else:
+                results[file_path] = entries
+        return results
+    
+    def write_many(self, files: Dict[Path, Entries], max_workers: Optional[int] = None) -> None:
+        """Write many stringtables in parallel worker processes."""
+        if len(files) < 2:
+            for item in files.items():
+                _write_one(item)
+            return
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Consume the results so a failed write raises here
+            list(executor.map(_write_one, files.items(), chunksize=4))
+    
+    def is_stringtable(self, file_path: Path) -> bool:
+        """Cheaply check that a file is a StringTableFile by reading only up to its root tag."""
+        try:
+            with open(file_path, "rb") as file:
+                parser = ET.XMLPullParser(events=("start",))
+                # The root tag sits in the first few hundred bytes, so this
+                # normally stops after a single 4 KiB read
+                while chunk := file.read(_SNIFF_CHUNK_SIZE):
+                    parser.feed(chunk)
+                    for _, element in parser.read_events():
+                        return element.tag == "StringTableFile"
+        except (ET.ParseError, OSError):
+            pass
+        return False
+    
+    def write_stringtable(self, file_path: Path, entries: Entries, make_parents: bool = True) -> None:
+        """Write entries to a .stringtable XML file.
+        
+        Accepts the list-of-dicts form from parse_stringtable or the parallel-list form from parse_stringtable_soa.
+        Callers that create the output directories up front pass make_parents=False.
+        """
+        if isinstance(entries, dict):
+            pairs = zip(entries["ids"], entries["texts"])
+            count = len(entries["ids"])
+        else:
+            pairs = ((entry.get("id", ""), entry.get("text", "")) for entry in entries)
+            count = len(entries)
+        
+        try:
+            parts = [
+                _STRINGTABLE_HEADER,
+                f"  <Name>{_escape_text(file_path.stem)}</Name>\n",
+                # NextEntryID is the number of entries + 1
+                f"  <NextEntryID>{count + 1}</NextEntryID>\n",
+                f"  <EntryCount>{count}</EntryCount>\n",
+                "  <Entries>\n" if count else "  <Entries />\n",
+            ]
+            
+            escape_text = _escape_text
+            for entry_id, entry_text in pairs:
+                # FemaleText copies DefaultText for consistency; escape it once for both
+                text = escape_text(entry_text)
+                parts.append(
+                    f"    <Entry>\n      <ID>{escape_text(str(entry_id))}</ID>\n"
+                    f"      <DefaultText>{text}</DefaultText>\n"
+                    f"      <FemaleText>{text}</FemaleText>\n    </Entry>\n"
+                )
+            
+            parts.append("  </Entries>\n</StringTableFile>" if count else "</StringTableFile>")
             
             # Ensure parent directory exists
-            file_path.parent.mkdir(parents=True, exist_ok=True)
+            if make_parents:
+                file_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Write with proper encoding and formatting
-            tree.write(
-                file_path,
-                encoding="utf-8",
-                xml_declaration=True,
-                method="xml"
-            )
+            # Encode once and write the bytes in a single call
+            file_path.write_bytes("".join(parts).encode("utf-8"))
             
-            self.logger.debug(f"Wrote {len(entries)} entries to {file_path}")
+            self.logger.debug("Wrote %s entries to %s", count, file_path)
             
         except Exception as e:
-            self.logger.error(f"Error writing {file_path}: {e}")
+            self.logger.error("Error writing %s: %s", file_path, e)
             raise
     
+    def _id_digest(self, file_path: Path) -> tuple[int, bytes]:
+        """Stream a stringtable's entry IDs into a running hash; returns (entry count, digest)."""
+        digest = hashlib.blake2b(digest_size=16)
+        count = 0
+        for standard, element in self._iter_entries(file_path):
+            entry_id = _entry_id(element, standard)
+            # NUL never occurs in XML text, so it separates IDs unambiguously
+            digest.update(entry_id.encode("utf-8") + b"\0")
+            count += 1
+        return count, digest.digest()
+    
     def validate_xml_roundtrip(self, original_path: Path, new_path: Path) -> bool:
         """Validate that XML can be parsed after writing."""
         try:
-            original_entries = self.parse_stringtable(original_path)
-            new_entries = self.parse_stringtable(new_path)
+            original_count, original_digest = self._id_digest(original_path)
+            new_count, new_digest = self._id_digest(new_path)
             
-            if len(original_entries) != len(new_entries):
-                self.logger.warning(f"Entry count mismatch: {len(original_entries)} vs {len(new_entries)}")
+            if original_count != new_count:
+                self.logger.warning("Entry count mismatch: %s vs %s", original_count, new_count)
                 return False
             
-            for orig, new in zip(original_entries, new_entries):
-                if orig.get("id") != new.get("id"):
-                    self.logger.warning(f"ID mismatch: {orig.get('id')} vs {new.get('id')}")
-                    return False
+            if original_digest != new_digest:
+                self.logger.warning("ID mismatch between %s and %s", original_path, new_path)
+                return False
             
             return True
             
         except Exception as e:
-            self.logger.error(f"Validation failed: {e}")
+            self.logger.error("Validation failed: %s", e)
             return False
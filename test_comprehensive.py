@@ -4,6 +4,7 @@ Comprehensive integration test for the Pillars of Eternity translation tool.
 Tests all major components with realistic scenarios.
 """
 
+import atexit
 import os
 import sys
 import tempfile
@@ -14,200 +15,293 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.config import Config
-from src.translator import TranslationService
+from src.translator import _PLACEHOLDER_RE, TranslationService
 from src.xml_utils import XMLProcessor
-from src.cache import TranslationCache
+from src.cache import FileStateCache, TranslationCache
 
-def create_test_xml_file(file_path: Path, entries_data: list):
-    """Create a test XML file with given entries."""
-    content = """<?xml version="1.0" encoding="utf-8"?>
+_TEST_XML_HEADER = """<?xml version="1.0" encoding="utf-8"?>
 <StringTableFile xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema">
   <Name>test_file</Name>
-  <NextEntryID>{next_id}</NextEntryID>
-  <EntryCount>{count}</EntryCount>
+  <NextEntryID>%s</NextEntryID>
+  <EntryCount>%s</EntryCount>
   <Entries>
-{entries}
-  </Entries>
-</StringTableFile>""".format(
-        next_id=len(entries_data) + 1,
-        count=len(entries_data),
-        entries='\n'.join([
-            f'    <Entry>\n      <ID>{i+1}</ID>\n      <DefaultText>{text}</DefaultText>\n      <FemaleText />\n    </Entry>'
-            for i, text in enumerate(entries_data)
-        ])
-    )
+"""
+_TEST_ENTRY_TEMPLATE = """    <Entry>
+      <ID>%s</ID>
+      <DefaultText>%s</DefaultText>
+      <FemaleText />
+    </Entry>
+"""
+_TEST_XML_FOOTER = """  </Entries>
+</StringTableFile>"""
+
+# One scratch directory for the whole run; each test works in its own subdirectory
+_SCRATCH_ROOT = Path(tempfile.mkdtemp(prefix="pillar_tests_"))
+atexit.register(shutil.rmtree, _SCRATCH_ROOT, ignore_errors=True)
+
+def scratch_dir(name: str) -> Path:
+    """Create a fresh directory for one test under the shared scratch root."""
+    path = _SCRATCH_ROOT / name
+    path.mkdir()
+    return path
+
+def create_test_xml_file(file_path: Path, entries_data: list):
+    """Create a test XML file with given entries."""
+    parts = [_TEST_XML_HEADER % (len(entries_data) + 1, len(entries_data))]
+    parts.extend(_TEST_ENTRY_TEMPLATE % (i + 1, text) for i, text in enumerate(entries_data))
+    parts.append(_TEST_XML_FOOTER)
+    content = ''.join(parts)
     
     file_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    file_path.write_bytes(content.encode('utf-8'))
 
 def test_xml_processing():
     """Test XML parsing and writing functionality."""
     print("🔧 Testing XML processing...")
     
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
-        # Create test XML file
-        test_file = temp_path / "test.stringtable"
-        test_entries = [
-            "Hello world",
-            "Welcome to the game, {PlayerName}!",
-            "The [color=red]dangerous[/color] path awaits."
-        ]
-        
-        create_test_xml_file(test_file, test_entries)
-        
-        # Test parsing
-        processor = XMLProcessor()
-        entries = processor.parse_stringtable(test_file)
-        
-        assert len(entries) == 3, f"Expected 3 entries, got {len(entries)}"
-        assert entries[0]['text'] == "Hello world"
-        assert "{PlayerName}" in entries[1]['text']
-        assert "[color=red]" in entries[2]['text']
-        
-        # Test writing
-        output_file = temp_path / "output.stringtable"
-        processor.write_stringtable(output_file, entries)
-        
-        # Test round-trip
-        entries_after = processor.parse_stringtable(output_file)
-        assert len(entries_after) == len(entries)
-        
-        print("✅ XML processing test passed")
+    temp_path = scratch_dir("test_xml_processing")
+    
+    # Create test XML file
+    test_file = temp_path / "test.stringtable"
+    test_entries = [
+        "Hello world",
+        "Welcome to the game, {PlayerName}!",
+        "The [color=red]dangerous[/color] path awaits."
+    ]
+    
+    create_test_xml_file(test_file, test_entries)
+    
+    # Test parsing
+    processor = XMLProcessor()
+    entries = processor.parse_stringtable(test_file)
+    
+    assert len(entries) == 3, f"Expected 3 entries, got {len(entries)}"
+    assert entries[0]['text'] == "Hello world"
+    assert "{PlayerName}" in entries[1]['text']
+    assert "[color=red]" in entries[2]['text']
+    
+    # Test writing
+    output_file = temp_path / "output.stringtable"
+    processor.write_stringtable(output_file, entries)
+    
+    # Test round-trip
+    entries_after = processor.parse_stringtable(output_file)
+    assert len(entries_after) == len(entries)
+    
+    print("✅ XML processing test passed")
 
 def test_caching_system():
     """Test the caching functionality."""
     print("🔧 Testing caching system...")
     
-    with tempfile.TemporaryDirectory() as temp_dir:
-        cache_file = Path(temp_dir) / "test_cache.db"
-        cache = TranslationCache(cache_file)
-        
-        # Test storage and retrieval
-        original_text = "Hello world"
-        translated_text = "سلام دنیا"
-        
-        # Store translation
-        cache.store_translation(original_text, translated_text)
-        
-        # Retrieve translation
-        cached_result = cache.get_translation(original_text)
-        assert cached_result == translated_text, f"Expected '{translated_text}', got '{cached_result}'"
-        
-        # Test cache miss
-        missing_result = cache.get_translation("Non-existent text")
-        assert missing_result is None
-        
-        # Test stats
-        stats = cache.get_cache_stats()
-        assert stats['total_translations'] >= 1
-        
-        print("✅ Caching system test passed")
+    temp_dir = scratch_dir("test_caching_system")
+    cache_file = temp_dir / "test_cache.db"
+    cache = TranslationCache(cache_file)
+    assert cache._conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    
+    # Test storage and retrieval
+    original_text = "Hello world"
+    translated_text = "سلام دنیا"
+    
+    # Store translation
+    cache.store_translation(original_text, translated_text)
+    
+    # Retrieve translation
+    cached_result = cache.get_translation(original_text)
+    assert cached_result == translated_text, f"Expected '{translated_text}', got '{cached_result}'"
+    
+    # Test cache miss
+    missing_result = cache.get_translation("Non-existent text")
+    assert missing_result is None
+
+    # Test batch storage
+    cache.store_translations([("Yes", "بله"), ("No", "نه")])
+    assert cache.get_translation("Yes") == "بله"
+    assert cache.get_translation("No") == "نه"
+
+    # Test bulk lookup (misses are simply absent)
+    bulk = cache.get_translations_bulk(["Yes", "No", "Non-existent text"])
+    assert bulk == {"Yes": "بله", "No": "نه"}
+
+    # Bulk hits are remembered, so a fresh cache on the same file warms up
+    cache.flush()
+    reopened = TranslationCache(cache_file)
+    assert reopened.get_translations_bulk(["Yes"]) == {"Yes": "بله"}
+    assert reopened._mem["Yes"] == "بله"
+    reopened.close()
+
+    # Repeat lookups are answered from memory, and stores refresh it
+    assert cache._mem["Hello world"] == translated_text
+    cache.store_translation("Yes", "آری")
+    assert cache.get_translation("Yes") == "آری"
+
+    # Writes are buffered: 1000 stores commit in a handful of transactions
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    for i in range(1000):
+        cache.store_translation(f"Line {i}", f"خط {i}")
+    assert cache.get_translation("Line 999") == "خط 999"
+    cache.flush()
+    cache._conn.set_trace_callback(None)
+    commits = sum(1 for statement in statements if statement.strip().upper() == "COMMIT")
+    assert 1 <= commits <= 5, f"Expected at most 5 commits, got {commits}"
+
+    # A digest collision (same key, different original) is not a hit
+    cache._conn.execute(
+        "INSERT INTO translations (text_hash, original_text, translated_text) VALUES (?, ?, ?)",
+        (cache._hash_text("Colliding text"), "Some other text", "متن دیگر")
+    )
+    assert cache.get_translation("Colliding text") is None
+    assert cache.get_translations_bulk(["Colliding text"]) == {}
+
+    # Test file state tracking on the same database
+    file_state = FileStateCache(cache)
+    file_state.record([("conversations/a.stringtable", 1.5, 120, 2.5)])
+    assert file_state.load() == {"conversations/a.stringtable": (1.5, 120)}
+
+    # Test stats
+    stats = cache.get_cache_stats()
+    assert stats['total_translations'] >= 1
+    
+    print("✅ Caching system test passed")
+
+def test_cache_migration():
+    """Test that caches written with the legacy SHA-256 schema are migrated."""
+    print("🔧 Testing cache migration...")
+
+    import hashlib
+    import sqlite3
+
+    temp_dir = scratch_dir("test_cache_migration")
+    cache_file = temp_dir / "legacy_cache.db"
+
+    # Recreate the original schema and populate it
+    with sqlite3.connect(cache_file) as conn:
+        conn.execute("""
+            CREATE TABLE translations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text_hash TEXT UNIQUE NOT NULL,
+                original_text TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("CREATE INDEX idx_text_hash ON translations(text_hash)")
+        conn.execute(
+            "INSERT INTO translations (text_hash, original_text, translated_text) VALUES (?, ?, ?)",
+            (hashlib.sha256("Hello world".encode('utf-8')).hexdigest(), "Hello world", "سلام دنیا")
+        )
+
+    cache = TranslationCache(cache_file)
+    assert cache.get_translation("Hello world") == "سلام دنیا"
+    assert cache.get_cache_stats()['total_translations'] == 1
+    cache.close()
+
+    # Reopening must not migrate again or lose data
+    cache = TranslationCache(cache_file)
+    assert cache.get_translation("Hello world") == "سلام دنیا"
+    schema = cache._conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'translations'"
+    ).fetchone()[0]
+    assert "WITHOUT ROWID" in schema
+    indexes = cache._conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name = 'idx_text_hash'"
+    ).fetchall()
+    assert indexes == []
+    cache.close()
+
+    print("✅ Cache migration test passed")
 
 def test_placeholder_handling():
     """Test placeholder extraction and restoration."""
     print("🔧 Testing placeholder handling...")
     
     # Create a mock config for translator
-    with tempfile.TemporaryDirectory() as temp_dir:
-        config = Config(
-            input_dir=Path(temp_dir),
-            output_dir=Path(temp_dir),
-            openai_api_key="test_key_not_used"
-        )
-        
-        # Don't actually initialize OpenAI client for this test
-        # Just test placeholder functionality
-        from src.translator import TranslationService
-        
-        # Test text with various placeholders
-        test_text = "Welcome {PlayerName} to [color=gold]Dyrwood[/color]! You have {ItemCount} items."
-        
-        # Manually test placeholder extraction (without full translator setup)
-        import re
-        
-        placeholders = []
-        # Unity-style placeholders: {variable}
-        placeholders.extend(re.findall(r'\{[^}]+\}', test_text))
-        # Rich text tags: [tag=value], [/tag]
-        placeholders.extend(re.findall(r'\[[^\]]+\]', test_text))
-        
-        expected_placeholders = ['{PlayerName}', '[color=gold]', '[/color]', '{ItemCount}']
-        assert all(ph in placeholders for ph in expected_placeholders), f"Missing placeholders: {placeholders}"
-        
-        print("✅ Placeholder handling test passed")
+    temp_dir = scratch_dir("test_placeholder_handling")
+    config = Config(
+        input_dir=temp_dir,
+        output_dir=temp_dir,
+        openai_api_key="test_key_not_used"
+    )
+    
+    # Don't actually initialize OpenAI client for this test
+    # Just test placeholder functionality
+    from src.translator import TranslationService
+    
+    # Test text with various placeholders
+    test_text = "Welcome {PlayerName} to [color=gold]Dyrwood[/color]! You have {ItemCount} items."
+    
+    # Test placeholder extraction with the translator's compiled pattern
+    # (without full translator setup); one pass finds every kind
+    placeholders = _PLACEHOLDER_RE.findall(test_text)
+    
+    expected_placeholders = ['{PlayerName}', '[color=gold]', '[/color]', '{ItemCount}']
+    assert all(ph in placeholders for ph in expected_placeholders), f"Missing placeholders: {placeholders}"
+    
+    print("✅ Placeholder handling test passed")
 
 def test_config_validation():
     """Test configuration validation."""
     print("🔧 Testing configuration validation...")
     
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
-        # Test valid config
-        config = Config(
-            input_dir=temp_path,
-            output_dir=temp_path / "output",
+    temp_path = scratch_dir("test_config_validation")
+    
+    # Test valid config
+    config = Config(
+        input_dir=temp_path,
+        output_dir=temp_path / "output",
+        openai_api_key="test_key"
+    )
+    assert config.batch_size == 20  # Default value
+    assert config.target_language == "Farsi"
+    
+    # Test invalid input directory
+    try:
+        Config(
+            input_dir=Path("/non/existent/path"),
+            output_dir=temp_path,
             openai_api_key="test_key"
         )
-        assert config.batch_size == 20  # Default value
-        assert config.target_language == "Farsi"
-        
-        # Test invalid input directory
-        try:
-            Config(
-                input_dir=Path("/non/existent/path"),
-                output_dir=temp_path,
-                openai_api_key="test_key"
-            )
-            assert False, "Should have raised ValueError for non-existent input directory"
-        except ValueError:
-            pass  # Expected
+        assert False, "Should have raised ValueError for non-existent input directory"
+    except ValueError:
+        pass  # Expected
+    
+    # Test missing API key
+    try:
+        Config(
+            input_dir=temp_path,
+            output_dir=temp_path,
+            openai_api_key=None
+        )
+        assert False, "Should have raised ValueError for missing API key"
+    except ValueError:
+        pass  # Expected
         
-        # Test missing API key
-        try:
-            Config(
-                input_dir=temp_path,
-                output_dir=temp_path,
-                openai_api_key=None
-            )
-            assert False, "Should have raised ValueError for missing API key"
-        except ValueError:
-            pass  # Expected
-            
-        print("✅ Configuration validation test passed")
+    print("✅ Configuration validation test passed")
 
 def test_batch_size_consistency():
     """Test that batch sizes are consistent across the codebase."""
     print("🔧 Testing batch size consistency...")
     
-    # Import CLI module to check defaults
-    sys.path.insert(0, str(Path(__file__).parent))
-    
-    # Check that all defaults are aligned
-    from src.config import Config
-    
     # Default config batch size
-    with tempfile.TemporaryDirectory() as temp_dir:
-        config = Config(
-            input_dir=Path(temp_dir),
-            output_dir=Path(temp_dir),
-            openai_api_key="test"
-        )
-        assert config.batch_size == 20, f"Config default should be 20, got {config.batch_size}"
-    
+    temp_dir = scratch_dir("test_batch_size_consistency")
+    config = Config(
+        input_dir=temp_dir,
+        output_dir=temp_dir,
+        openai_api_key="test"
+    )
+    assert config.batch_size == 20, f"Config default should be 20, got {config.batch_size}"
+
     # Check CLI argument parsing by examining the file
     cli_file = Path(__file__).parent / 'src' / 'cli.py'
-    cli_content = cli_file.read_text()
+    cli_content = cli_file.read_bytes()
     
     # Count occurrences of "default=20" for batch-size arguments
-    default_20_count = cli_content.count('default=20,\n        help="Batch size for API requests (default: 20)"')
+    default_20_count = cli_content.count(b'default=20,\n        help="Batch size for API requests (default: 20)"')
     assert default_20_count >= 2, f"Should have at least 2 CLI batch-size defaults set to 20, found {default_20_count}"
     
     # Check that there are no "default=100" remaining
-    default_100_count = cli_content.count('default=100')
+    default_100_count = cli_content.count(b'default=100')
     assert default_100_count == 0, f"Should have no default=100 remaining, found {default_100_count}"
     
     print("✅ Batch size consistency test passed")
@@ -216,57 +310,75 @@ def test_integration_without_api():
     """Test integration flow without making API calls."""
     print("🔧 Testing integration flow (no API calls)...")
     
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
-        # Create input directory and files
-        input_dir = temp_path / "input"
-        output_dir = temp_path / "output"
-        
-        # Create test XML file
-        test_file = input_dir / "test.stringtable"
-        test_entries = [
-            "Simple text",
-            "Text with {PlayerName} placeholder"
-        ]
-        create_test_xml_file(test_file, test_entries)
-        
-        # Create config
-        config = Config(
-            input_dir=input_dir,
-            output_dir=output_dir,
-            openai_api_key="test_key_for_validation_only"
-        )
-        
-        # Test XML processing
-        processor = XMLProcessor()
-        entries = processor.parse_stringtable(test_file)
-        
-        assert len(entries) == 2
-        assert entries[0]['text'] == "Simple text"
-        
-        # Test output directory creation
-        output_localized_dir = output_dir / "localized" / "it" / "text"
-        output_localized_dir.mkdir(parents=True, exist_ok=True)
-        assert output_localized_dir.exists()
-        
-        # Test writing translated file (with dummy translations)
-        entries[0]['text'] = "متن ساده"  # Simple text in Farsi
-        entries[1]['text'] = "متن با {PlayerName} placeholder"  # Text with placeholder in Farsi
-        
-        output_file = output_localized_dir / "test.stringtable"
-        processor.write_stringtable(output_file, entries)
-        
-        # Verify output file
-        assert output_file.exists()
-        output_entries = processor.parse_stringtable(output_file)
-        assert len(output_entries) == 2
-        assert "{PlayerName}" in output_entries[1]['text']  # Placeholder preserved
-        
-        print("✅ Integration test passed")
+    temp_path = scratch_dir("test_integration_without_api")
+    
+    # Create input directory and files
+    input_dir = temp_path / "input"
+    output_dir = temp_path / "output"
+    
+    # Create test XML files
+    test_file = input_dir / "test.stringtable"
+    test_entries = [
+        "Simple text",
+        "Text with {PlayerName} placeholder"
+    ]
+    create_test_xml_file(test_file, test_entries)
+    other_file = input_dir / "other.stringtable"
+    create_test_xml_file(other_file, ["Another text"])
+    
+    # Create config
+    config = Config(
+        input_dir=input_dir,
+        output_dir=output_dir,
+        openai_api_key="test_key_for_validation_only"
+    )
+    
+    # Test XML processing across both files in parallel
+    processor = XMLProcessor()
+    parsed = processor.parse_many(sorted(input_dir.rglob("*.stringtable")))
+    assert set(parsed) == {test_file, other_file}
+    assert parsed[other_file][0]['text'] == "Another text"
+    
+    table = processor.parse_stringtable_soa(test_file)
+    assert table['texts'] == [entry['text'] for entry in parsed[test_file]]
+    
+    assert len(table['texts']) == 2
+    assert table['texts'][0] == "Simple text"
+    
+    # Test output directory creation
+    output_localized_dir = output_dir / "localized" / "it" / "text"
+    output_localized_dir.mkdir(parents=True, exist_ok=True)
+    assert output_localized_dir.exists()
+    
+    # Test writing translated file (with dummy translations)
+    table['texts'][0] = "متن ساده"  # Simple text in Farsi
+    table['texts'][1] = "متن با {PlayerName} placeholder"  # Text with placeholder in Farsi
+    
+    output_file = output_localized_dir / "test.stringtable"
+    processor.write_stringtable(output_file, table)
+    
+    # Verify output file
+    assert output_file.exists()
+    output_table = processor.parse_stringtable_soa(output_file)
+    assert len(output_table['texts']) == 2
+    assert "{PlayerName}" in output_table['texts'][1]  # Placeholder preserved
+    
+    print("✅ Integration test passed")
 
 def run_all_tests():
-    """Run all comprehensive tests."""
+    """Run all comprehensive tests, in parallel processes when pytest-xdist is installed."""
+    try:
+        import pytest
+        import xdist  # noqa: F401
+    except ImportError:
+        return run_tests_sequentially()
+    
+    # Every test works in its own scratch directory, so they can run side by side
+    print("🚀 Starting comprehensive test suite (pytest-xdist)...")
+    return pytest.main(['-n', 'auto', '-q', __file__]) == 0
+
+def run_tests_sequentially():
+    """Run all comprehensive tests one after another in this process."""
     print("🚀 Starting comprehensive test suite...")
     print("=" * 50)
     
@@ -274,6 +386,7 @@ def run_all_tests():
         test_config_validation()
         test_xml_processing()
         test_caching_system()
+        test_cache_migration()
         test_placeholder_handling()
         test_batch_size_consistency()
         test_integration_without_api()
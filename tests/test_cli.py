@@ -0,0 +1,129 @@
+"""
+Tests for the build command.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src import cli
+from src.translator import BatchJobError
+from src.xml_utils import XMLProcessor
+
+
+class TestBuildCommand(unittest.TestCase):
+    """Test cases for build_command."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.input_dir = self.temp_dir / "input"
+        self.output_dir = self.temp_dir / "out"
+        
+        processor = XMLProcessor()
+        for i in range(10):
+            processor.write_stringtable(
+                self.input_dir / f"strings_{i}.stringtable",
+                {"ids": ["1", "2"], "texts": [f"Line {i}", "Yes"]}
+            )
+        
+        # Keep the real translator and its on-disk cache out of these tests
+        patchers = [
+            patch.dict(os.environ, {"OPENAI_API_KEY": "test-key-123"}),
+            patch('src.cli.TranslationService'),
+            patch('src.cli.FileStateCache'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        cli.FileStateCache.return_value.load.return_value = {}
+        self.translator = cli.TranslationService.return_value
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_interrupt_stops_queued_files(self):
+        """Test that an interrupted build does not go on to process the queued files."""
+        calls = []
+        
+        def process_one_file(*args):
+            calls.append(args[0])
+            if len(calls) == 1:
+                # Delivered to the main thread through future.result()
+                raise KeyboardInterrupt
+            time.sleep(0.05)
+            return True
+        
+        with patch('src.cli._process_one_file', side_effect=process_one_file):
+            with self.assertRaises(KeyboardInterrupt):
+                cli.build_command(str(self.input_dir), str(self.output_dir), max_workers=1)
+            
+            # The single worker may already have picked up the next file
+            time.sleep(0.3)
+            self.assertLessEqual(len(calls), 2)
+    
+    def test_build_creates_output_directories_up_front(self):
+        """Test that files are written without a directory check each, the build having created them."""
+        self.translator.translate_batch.side_effect = lambda texts, batch_size: texts
+        
+        write = XMLProcessor.write_stringtable
+        with patch.object(XMLProcessor, 'write_stringtable', autospec=True, side_effect=write) as mock_write:
+            cli.build_command(str(self.input_dir), str(self.output_dir), max_workers=2)
+        
+        self.assertEqual(len(list(self.output_dir.rglob("*.stringtable"))), 10)
+        self.assertEqual(mock_write.call_count, 10)
+        for call in mock_write.call_args_list:
+            self.assertIs(call.kwargs["make_parents"], False)
+    
+    def test_batch_api_build_submits_one_job(self):
+        """Test that the per-file pass reuses the up-front Batch API results."""
+        # Texts the job returns unchanged are never cached, so they must not
+        # send the per-file pass back to the Batch API
+        self.translator.translate_via_batch_api.side_effect = lambda texts, batch_size, batch_ids: [
+            text if text == "Yes" else "FA:" + text for text in texts
+        ]
+        
+        parse = XMLProcessor.parse_stringtable_soa
+        with patch.object(XMLProcessor, 'parse_stringtable_soa', autospec=True, side_effect=parse) as mock_parse:
+            cli.build_command(str(self.input_dir), str(self.output_dir), max_workers=2, use_batch_api=True)
+        
+        self.translator.translate_via_batch_api.assert_called_once()
+        self.translator.translate_batch.assert_not_called()
+        
+        # The per-file pass reuses the tables parsed for the job (in worker processes)
+        mock_parse.assert_not_called()
+        
+        output = XMLProcessor().parse_stringtable_soa(
+            self.output_dir / "localized" / "it" / "text" / "strings_3.stringtable"
+        )
+        self.assertEqual(output["texts"], ["FA:Line 3", "Yes"])
+    
+    def test_failed_batch_job_writes_nothing(self):
+        """Test that a Batch API job that does not complete stops the build before any file is written."""
+        self.translator.translate_via_batch_api.side_effect = BatchJobError("Batch jobs did not complete: batch-1 (failed)")
+        
+        with self.assertRaises(BatchJobError):
+            cli.build_command(str(self.input_dir), str(self.output_dir), use_batch_api=True)
+        
+        self.assertEqual(list(self.output_dir.rglob("*.stringtable")), [])
+        cli.FileStateCache.return_value.record.assert_not_called()
+    
+    def test_resume_batch_ids_are_passed_on(self):
+        """Test that resuming a build waits on the given jobs, with the Batch API implied."""
+        self.translator.translate_via_batch_api.side_effect = lambda texts, batch_size, batch_ids: texts
+        
+        cli.build_command(str(self.input_dir), str(self.output_dir), resume_batch_ids=["batch-1", "batch-2"])
+        
+        self.assertEqual(
+            self.translator.translate_via_batch_api.call_args.kwargs["batch_ids"], ["batch-1", "batch-2"]
+        )
+        self.translator.translate_batch.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Tests for the API rate limiter.
+"""
+
+import threading
+import time
+import unittest
+
+from src.rate_limiter import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for RateLimiter."""
+    
+    def test_acquire_within_budget_does_not_wait(self):
+        """Requests inside both budgets are granted immediately."""
+        limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=10_000)
+        
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire(100)
+        
+        self.assertLess(time.monotonic() - start, 0.1)
+    
+    def test_acquire_waits_for_request_budget(self):
+        """An empty request bucket blocks until it refills."""
+        # 600 RPM refills one request every 0.1s
+        limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1_000_000)
+        limiter._available_requests = 0
+        
+        start = time.monotonic()
+        limiter.acquire(1)
+        
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+    
+    def test_acquire_waits_for_token_budget(self):
+        """An empty token bucket blocks until enough tokens refill."""
+        # 60,000 TPM refills 100 tokens every 0.1s
+        limiter = RateLimiter(requests_per_minute=1_000, tokens_per_minute=60_000)
+        limiter._available_tokens = 0
+        
+        start = time.monotonic()
+        limiter.acquire(100)
+        
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+    
+    def test_acquire_is_thread_safe(self):
+        """Concurrent callers never overdraw the request bucket."""
+        limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=1_000_000)
+        granted = []
+        
+        def worker():
+            limiter.acquire(1)
+            granted.append(time.monotonic())
+        
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(granted), 10)
+        self.assertGreaterEqual(limiter._available_requests, -1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,23 +2,51 @@
 Tests for translation service.
 """
 
+import dataclasses
+import json
 import os
+import shutil
 import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+from src.cache import TranslationCache
 from src.config import Config
-from src.translator import TranslationService
+from src.translator import BatchJobError, TranslationService, _load_compiled_glossary
 
 
 class TestTranslationService(unittest.TestCase):
     """Test cases for TranslationService."""
     
+    @classmethod
+    def setUpClass(cls):
+        """Create one temporary directory shared by every test in the class."""
+        cls._root = Path(tempfile.mkdtemp())
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the shared temporary directory."""
+        shutil.rmtree(cls._root)
+    
     def setUp(self):
         """Set up test fixtures."""
-        # Create temporary directories
-        self.temp_dir = Path(tempfile.mkdtemp())
+        # Each test works in its own subdirectory of the shared one
+        self.temp_dir = self._root / self._testMethodName
+        self.temp_dir.mkdir()
+        
+        # Each service opens its own cache here rather than in the working
+        # directory, and it is closed when the test ends
+        def open_cache():
+            cache = TranslationCache(self.temp_dir / f"translation_cache_{len(self.caches)}.db")
+            self.caches.append(cache)
+            self.addCleanup(cache.close)
+            return cache
+        
+        self.caches = []
+        cache_patcher = patch('src.translator.TranslationCache', side_effect=open_cache)
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
         
         # Mock config
         self.config = Config(
@@ -27,11 +55,6 @@ class TestTranslationService(unittest.TestCase):
             openai_api_key="test-key-123"
         )
     
-    def tearDown(self):
-        """Clean up test fixtures."""
-        import shutil
-        shutil.rmtree(self.temp_dir)
-    
     def test_extract_placeholders(self):
         """Test placeholder extraction."""
         service = TranslationService(self.config)
@@ -41,6 +64,12 @@ class TestTranslationService(unittest.TestCase):
         
         expected = ['{PlayerName}', '[color=red]', '[/color]']
         self.assertEqual(set(placeholders), set(expected))
+        
+        # Numbered placeholders are extracted once, in document order
+        self.assertEqual(
+            service._extract_placeholders("<b>{0}</b> of {1}"),
+            ['<b>', '{0}', '</b>', '{1}']
+        )
     
     def test_placeholder_replacement_and_restoration(self):
         """Test placeholder token replacement and restoration."""
@@ -60,6 +89,17 @@ class TestTranslationService(unittest.TestCase):
         
         # Should match original
         self.assertEqual(restored_text, original_text)
+        
+        # Repeated texts reuse the memoized result without sharing the caller's map
+        placeholder_map.clear()
+        self.assertEqual(
+            service._replace_placeholders_with_tokens(original_text),
+            (text_with_tokens, {
+                "__PLACEHOLDER_0__": "{PlayerName}",
+                "__PLACEHOLDER_1__": "[color=red]",
+                "__PLACEHOLDER_2__": "[/color]"
+            })
+        )
     
     def test_apply_glossary(self):
         """Test glossary application."""
@@ -69,18 +109,78 @@ class TestTranslationService(unittest.TestCase):
             f.write("english,farsi\n")
             f.write("hello,سلام\n")
             f.write("world,جهان\n")
+            f.write("hello world,درود بر جهان\n")
         
         # Update config with glossary
-        self.config.glossary_file = glossary_file
+        self.config = dataclasses.replace(self.config, glossary_file=glossary_file)
         
         service = TranslationService(self.config)
         
         text = "Hello world!"
         result = service._apply_glossary(text)
         
+        # The longest matching term wins over its parts
+        self.assertEqual(result, "درود بر جهان!")
+        
+        result = service._apply_glossary("World, hello.")
         self.assertIn("سلام", result)
         self.assertIn("جهان", result)
     
+    def test_apply_large_glossary(self):
+        """Test that a 10k-term glossary compiles and applies in one pass."""
+        glossary_file = self.temp_dir / "glossary.csv"
+        with open(glossary_file, 'w', encoding='utf-8') as f:
+            f.write("english,farsi\n")
+            for i in range(10_000):
+                f.write(f"term{i},واژه{i}\n")
+        
+        self.config = dataclasses.replace(self.config, glossary_file=glossary_file)
+        
+        service = TranslationService(self.config)
+        
+        self.assertEqual(len(service.glossary), 10_000)
+        self.assertEqual(service._apply_glossary("Term42 and term9999, not term10000."),
+                         "واژه42 and واژه9999, not term10000.")
+    
+    def test_glossary_json_cache(self):
+        """Test that an unchanged glossary is loaded from its JSON cache instead of the CSV."""
+        glossary_file = self.temp_dir / "glossary.csv"
+        with open(glossary_file, 'w', encoding='utf-8') as f:
+            f.write("english,farsi\n")
+            f.write("hello,سلام\n")
+        
+        self.config = dataclasses.replace(self.config, glossary_file=glossary_file)
+        
+        service = TranslationService(self.config)
+        self.assertTrue((self.temp_dir / "glossary.csv.cache.json").exists())
+        
+        # Bypass the in-process memo so the cache file is what gets read
+        _load_compiled_glossary.cache_clear()
+        with patch('src.translator.csv.reader', side_effect=AssertionError("CSV re-parsed")):
+            cached_service = TranslationService(self.config)
+        self.assertEqual(cached_service.glossary, service.glossary)
+        
+        # Editing the CSV invalidates the cache file
+        with open(glossary_file, 'a', encoding='utf-8') as f:
+            f.write("world,جهان\n")
+        os.utime(glossary_file, ns=(0, 0))
+        self.assertEqual(TranslationService(self.config).glossary, {"hello": "سلام", "world": "جهان"})
+    
+    def test_glossary_shared_between_services(self):
+        """Test that services on the same glossary version share its compiled state."""
+        glossary_file = self.temp_dir / "glossary.csv"
+        with open(glossary_file, 'w', encoding='utf-8') as f:
+            f.write("english,farsi\n")
+            f.write("hello,سلام\n")
+        
+        self.config = dataclasses.replace(self.config, glossary_file=glossary_file)
+        
+        service1 = TranslationService(self.config)
+        service2 = TranslationService(self.config)
+        
+        self.assertIs(service1._glossary_re, service2._glossary_re)
+        self.assertIs(service1.glossary, service2.glossary)
+    
     def test_estimate_tokens(self):
         """Test token estimation."""
         service = TranslationService(self.config)
@@ -91,6 +191,35 @@ class TestTranslationService(unittest.TestCase):
         # Should return a reasonable number
         self.assertGreater(tokens, 0)
         self.assertLess(tokens, len(text))  # Should be less than character count
+        
+        # Repeat estimates are served from the memo
+        service.tokenizer = Mock()
+        self.assertEqual(service.estimate_tokens(text), tokens)
+        service.tokenizer.encode.assert_not_called()
+    
+    def test_pack_batches(self):
+        """Test that batches are capped by both text count and token budget."""
+        service = TranslationService(self.config)
+        service._count_tokens = len  # one token per character
+        
+        short_texts = ["x" * 10] * 50
+        batches = service._pack_batches(short_texts, batch_size=20)
+        self.assertEqual([len(batch) for batch in batches], [20, 20, 10])
+        
+        long_texts = ["a" * 700, "b" * 700, "c" * 400, "d" * 100]
+        batches = service._pack_batches(long_texts, batch_size=20)
+        self.assertEqual(sorted(i for batch in batches for i in batch), [0, 1, 2, 3])
+        for batch in batches:
+            self.assertTrue(len(batch) == 1 or sum(len(long_texts[i]) for i in batch) <= 1200)
+    
+    @patch('src.translator.tiktoken.encoding_for_model', side_effect=OSError("offline"))
+    def test_estimate_tokens_without_tokenizer(self, mock_encoding_for_model):
+        """Test that a tokenizer load failure falls back to length and is not retried."""
+        service = TranslationService(self.config)
+        
+        self.assertEqual(service.estimate_tokens("x" * 40), 10)
+        self.assertEqual(service.estimate_tokens("y" * 80), 20)
+        mock_encoding_for_model.assert_called_once()
     
     def test_estimate_cost(self):
         """Test cost estimation."""
@@ -102,6 +231,11 @@ class TestTranslationService(unittest.TestCase):
         # Should return a reasonable cost
         self.assertGreater(cost, 0)
         self.assertLess(cost, 1)  # Should be less than $1 for 1000 tokens
+        
+        # A batch is priced as the sum of its texts' tokens
+        texts = ["Hello world", "Goodbye", "Hello world"]
+        expected = service.estimate_cost(sum(service.estimate_tokens(text) for text in texts))
+        self.assertAlmostEqual(service.estimate_batch_cost(texts), expected)
     
     @patch('src.translator.OpenAI')
     def test_translate_text_with_mock(self, mock_openai_class):
@@ -126,7 +260,168 @@ class TestTranslationService(unittest.TestCase):
         
         # Verify API was called
         mock_client.chat.completions.create.assert_called_once()
-
+    
+    @patch('src.translator.OpenAI')
+    def test_translate_batch_deduplicates_texts(self, mock_openai_class):
+        """Test that repeated texts in a batch are sent to the API once."""
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = "[1] بله\n[2] نه"
+        mock_client.chat.completions.create.return_value = mock_response
+        
+        service = TranslationService(self.config)
+        
+        results = service.translate_batch(["Yes", "No", "Yes", "Yes"])
+        
+        self.assertEqual(results, ["بله", "نه", "بله", "بله"])
+        user_prompt = mock_client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+        self.assertEqual(user_prompt.count("Yes"), 1)
+    
+    @patch('src.translator.OpenAI')
+    def test_translate_batch_deduplicates_across_batches(self, mock_openai_class):
+        """Test that repeats beyond one batch's size still cost a single request."""
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = "[1] بله\n[2] نه\n[3] شاید"
+        mock_client.chat.completions.create.return_value = mock_response
+        
+        service = TranslationService(self.config)
+        
+        texts = ["Yes", "No", "Maybe"] * 33 + ["Yes"]
+        results = service.translate_batch(texts, batch_size=20)
+        
+        self.assertEqual(len(results), 100)
+        self.assertEqual(results[:4], ["بله", "نه", "شاید", "بله"])
+        self.assertEqual(mock_client.chat.completions.create.call_count, 1)
+    
+    @patch('src.translator.OpenAI')
+    def test_retryable_errors(self, mock_openai_class):
+        """Test that rate-limit and transient errors are retried and others are not."""
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = "[1] بله"
+        mock_client.chat.completions.create.side_effect = [
+            Exception("Error code: 429 - Too Many Requests"),
+            Exception("Request timed out: Connection Timeout"),
+            mock_response
+        ]
+        
+        config = dataclasses.replace(self.config, retry_delay=0)
+        service = TranslationService(config)
+        
+        self.assertEqual(service.translate_batch(["Yes"]), ["بله"])
+        self.assertEqual(mock_client.chat.completions.create.call_count, 3)
+        
+        # A non-retryable error falls back to the original text straight away
+        mock_client.chat.completions.create.reset_mock(side_effect=True)
+        mock_client.chat.completions.create.side_effect = Exception("Invalid API key")
+        self.assertEqual(service.translate_batch(["No"]), ["No"])
+        mock_client.chat.completions.create.assert_called_once()
+    
+    def _mock_batch_client(self, mock_openai_class, answer, status="completed"):
+        """Mock a client whose Batch API jobs end with status, answering each request's prompt with answer(prompt)."""
+        mock_client = Mock()
+        mock_openai_class.return_value = mock_client
+        
+        mock_client.files.create.side_effect = lambda **kwargs: Mock(id=f"file-in-{mock_client.files.create.call_count}")
+        mock_client.batches.create.side_effect = lambda **kwargs: Mock(
+            id=kwargs["input_file_id"].replace("file-in", "batch"), status="validating"
+        )
+        mock_client.batches.retrieve.side_effect = lambda batch_id: Mock(
+            id=batch_id, status=status, output_file_id=batch_id.replace("batch", "file-out")
+        )
+        
+        def content(file_id):
+            # Answer the requests uploaded with the matching input file
+            number = int(file_id.rsplit("-", 1)[1])
+            _, upload = mock_client.files.create.call_args_list[number - 1].kwargs["file"]
+            results = []
+            for line in upload.decode("utf-8").splitlines():
+                request = json.loads(line)
+                prompt = request["body"]["messages"][1]["content"]
+                results.append(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "response": {"body": {"choices": [{"message": {"content": answer(prompt)}}]}}
+                }))
+            return Mock(text="\n".join(results) + "\n")
+        
+        mock_client.files.content.side_effect = content
+        return mock_client
+    
+    @patch('src.translator.OpenAI')
+    def test_translate_via_batch_api_with_mock(self, mock_openai_class):
+        """Test Batch API submission, polling and result parsing with a mocked client."""
+        mock_client = self._mock_batch_client(
+            mock_openai_class, lambda prompt: "[1] سلام __PLACEHOLDER_0__!\n[2] خداحافظ"
+        )
+        
+        config = dataclasses.replace(self.config, use_batch_api=True, batch_poll_interval=0)
+        service = TranslationService(config)
+        
+        results = service.translate_batch(["Hello {PlayerName}!", "Goodbye", "", "  ", "Hello {PlayerName}!"])
+        
+        self.assertEqual(results, ["سلام {PlayerName}!", "خداحافظ", "", "  ", "سلام {PlayerName}!"])
+        mock_client.chat.completions.create.assert_not_called()
+        self.assertEqual(mock_client.batches.create.call_args.kwargs["completion_window"], "24h")
+        
+        # Blank texts are returned unchanged without being submitted
+        _, upload = mock_client.files.create.call_args.kwargs["file"]
+        user_prompt = json.loads(upload)["body"]["messages"][1]["content"]
+        self.assertEqual(user_prompt.count("\n["), 2)
+        
+        # Results were cached, so a second run submits no new job
+        self.assertEqual(service.translate_batch(["Goodbye", " "]), ["خداحافظ", " "])
+        mock_client.batches.create.assert_called_once()
+    
+    @patch('src.translator.OpenAI')
+    def test_translate_via_batch_api_failed_job(self, mock_openai_class):
+        """Test that a job that does not complete raises instead of returning the originals."""
+        mock_client = self._mock_batch_client(mock_openai_class, lambda prompt: "[1] بله", status="failed")
+        mock_client.batches.retrieve.side_effect = lambda batch_id: Mock(
+            id=batch_id, status="failed", output_file_id=None
+        )
+        
+        config = dataclasses.replace(self.config, batch_poll_interval=0)
+        service = TranslationService(config)
+        
+        with self.assertRaises(BatchJobError) as raised:
+            service.translate_via_batch_api(["Yes"])
+        self.assertIn("batch-1 (failed)", str(raised.exception))
+        self.assertIsNone(service.cache.get_translation("Yes"))
+    
+    @patch('src.translator.OpenAI')
+    def test_translate_via_batch_api_splits_and_resumes_jobs(self, mock_openai_class):
+        """Test that requests over the per-job limit are split, and logged jobs can be resumed."""
+        mock_client = self._mock_batch_client(
+            mock_openai_class, lambda prompt: "[1] FA:" + prompt.rsplit("] ", 1)[1]
+        )
+        
+        config = dataclasses.replace(self.config, batch_poll_interval=0)
+        service = TranslationService(config)
+        texts = ["One", "Two", "Three"]
+        
+        # One text per request and one request per job
+        with patch('src.translator._BATCH_JOB_MAX_REQUESTS', 1):
+            service.translate_via_batch_api(texts, batch_size=1)
+        self.assertEqual(mock_client.batches.create.call_count, 3)
+        
+        # A rerun (with its own, empty cache) handed the logged job IDs polls them instead of submitting new ones
+        resumed = TranslationService(config)
+        mock_client.batches.create.reset_mock()
+        with patch('src.translator._BATCH_JOB_MAX_REQUESTS', 1):
+            results = resumed.translate_via_batch_api(texts, batch_size=1, batch_ids=["batch-1", "batch-2", "batch-3"])
+        
+        self.assertEqual(results, ["FA:One", "FA:Two", "FA:Three"])
+        mock_client.batches.create.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main()
@@ -5,6 +5,8 @@ Tests for XML utilities.
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
+from xml.etree import ElementTree
 
 from src.xml_utils import XMLProcessor
 
@@ -54,6 +56,65 @@ class TestXMLProcessor(unittest.TestCase):
         finally:
             temp_path.unlink()
     
+    def test_parse_stringtable_id_elements(self):
+        """Test parsing the game's layout, where each ID is an <ID> child element."""
+        game_xml = self.sample_xml.replace('<Entry ID="1">', '<Entry>\n      <ID>1</ID>').replace(
+            '<Entry ID="2">', '<Entry>\n      <ID>2</ID>'
+        )
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.stringtable', delete=False) as f:
+            f.write(game_xml)
+            temp_path = Path(f.name)
+        
+        try:
+            entries = self.processor.parse_stringtable(temp_path)
+            
+            self.assertEqual([entry['id'] for entry in entries], ['1', '2'])
+            self.assertEqual(self.processor.parse_stringtable_soa(temp_path)['ids'], ['1', '2'])
+            self.assertEqual(entries[0]['text'], 'Hello, {PlayerName}!')
+            
+        finally:
+            temp_path.unlink()
+    
+    def test_parse_stringtable_soa(self):
+        """Test parsing into parallel id/text lists."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.stringtable', delete=False) as f:
+            f.write(self.sample_xml)
+            temp_path = Path(f.name)
+        
+        try:
+            table = self.processor.parse_stringtable_soa(temp_path)
+            
+            self.assertEqual(table['ids'], ['1', '2'])
+            self.assertEqual(table['texts'], [
+                entry['text'] for entry in self.processor.parse_stringtable(temp_path)
+            ])
+            
+        finally:
+            temp_path.unlink()
+    
+    def test_parse_stringtable_streaming_fallback(self):
+        """Test the element-clearing parse path used when lxml is unavailable."""
+        entries_xml = "".join(
+            f'<Entry ID="{i}"><DefaultText>Line {i}</DefaultText><FemaleText /></Entry>'
+            for i in range(1000)
+        )
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.stringtable', delete=False) as f:
+            f.write(f"<StringTableFile><Name>big</Name><Entries>{entries_xml}</Entries></StringTableFile>")
+            temp_path = Path(f.name)
+        
+        try:
+            # Swap in the stdlib parser as well, as when lxml is not installed
+            with patch('src.xml_utils._HAVE_LXML', False), patch('src.xml_utils.ET', ElementTree):
+                entries = self.processor.parse_stringtable(temp_path)
+                self.assertTrue(self.processor.is_stringtable(temp_path))
+            
+            self.assertEqual(entries, self.processor.parse_stringtable(temp_path))
+            self.assertEqual(len(entries), 1000)
+            self.assertEqual(entries[999], {'id': '999', 'text': 'Line 999'})
+            
+        finally:
+            temp_path.unlink()
+    
     def test_write_stringtable(self):
         """Test writing a stringtable XML file."""
         entries = [
@@ -67,8 +128,9 @@ class TestXMLProcessor(unittest.TestCase):
         try:
             self.processor.write_stringtable(temp_path, entries)
             
-            # Verify the file was written correctly
+            # Verify the file was written correctly, with IDs as child elements
             self.assertTrue(temp_path.exists())
+            self.assertIn('<ID>1</ID>', temp_path.read_text(encoding='utf-8'))
             
             # Parse it back to check
             parsed_entries = self.processor.parse_stringtable(temp_path)
@@ -80,6 +142,76 @@ class TestXMLProcessor(unittest.TestCase):
         finally:
             temp_path.unlink()
     
+    def test_write_stringtable_without_making_parents(self):
+        """Test that make_parents=False skips the directory check."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            entries = [{'id': '1', 'text': 'Hello'}]
+            
+            with patch.object(Path, 'mkdir') as mock_mkdir:
+                self.processor.write_stringtable(Path(temp_dir) / "strings.stringtable", entries, make_parents=False)
+            mock_mkdir.assert_not_called()
+            
+            with self.assertRaises(FileNotFoundError):
+                self.processor.write_stringtable(Path(temp_dir) / "missing" / "strings.stringtable", entries, make_parents=False)
+    
+    def test_write_stringtable_escaping(self):
+        """Test that markup characters in text and IDs survive a write and parse."""
+        entries = [
+            {'id': '1 "a" & b', 'text': 'Fish & chips <b>now</b> > "later"'},
+            {'id': '2', 'text': ''}
+        ]
+        
+        with tempfile.NamedTemporaryFile(suffix='.stringtable', delete=False) as f:
+            temp_path = Path(f.name)
+        
+        try:
+            self.processor.write_stringtable(temp_path, entries)
+            
+            self.assertEqual(self.processor.parse_stringtable(temp_path), entries)
+            
+        finally:
+            temp_path.unlink()
+    
+    def test_parse_and_write_many(self):
+        """Test parallel parsing and writing of several files."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_path = Path(temp_dir)
+            paths = [temp_path / f"strings_{i}.stringtable" for i in range(3)]
+            for path in paths:
+                path.write_text(self.sample_xml, encoding='utf-8')
+            broken_path = temp_path / "broken.stringtable"
+            broken_path.write_text("<StringTableFile>", encoding='utf-8')
+            
+            parsed = self.processor.parse_many(paths + [broken_path], max_workers=2)
+            
+            # Unparseable files are left out
+            self.assertEqual(set(parsed), set(paths))
+            self.assertEqual(parsed[paths[0]][1]['text'], 'Welcome to the [color=gold]Golden City[/color].')
+            
+            outputs = {temp_path / "out" / path.name: entries for path, entries in parsed.items()}
+            self.processor.write_many(outputs, max_workers=2)
+            
+            for output_path, entries in outputs.items():
+                self.assertEqual(self.processor.parse_stringtable(output_path), entries)
+    
+    def test_is_stringtable(self):
+        """Test the root-tag check used to skip completed files."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.stringtable', delete=False) as f:
+            f.write(self.sample_xml)
+            valid_path = Path(f.name)
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.stringtable', delete=False) as f:
+            f.write('<!-- Translation failed: ' + 'x' * 200 + ' -->')
+            failed_path = Path(f.name)
+
+        try:
+            self.assertTrue(self.processor.is_stringtable(valid_path))
+            self.assertFalse(self.processor.is_stringtable(failed_path))
+
+        finally:
+            valid_path.unlink()
+            failed_path.unlink()
+
     def test_xml_roundtrip(self):
         """Test that XML can be parsed and written back correctly."""
         # Create original file
@@ -93,13 +225,22 @@ class TestXMLProcessor(unittest.TestCase):
         
         try:
             # Parse and write
-            entries = self.processor.parse_stringtable(original_path)
-            self.processor.write_stringtable(new_path, entries)
+            table = self.processor.parse_stringtable_soa(original_path)
+            self.processor.write_stringtable(new_path, table)
             
             # Validate roundtrip
             is_valid = self.processor.validate_xml_roundtrip(original_path, new_path)
             self.assertTrue(is_valid)
             
+            # Translated text is fine, a changed ID is not
+            table['texts'] = ['سلام', 'خوش آمدید']
+            self.processor.write_stringtable(new_path, table)
+            self.assertTrue(self.processor.validate_xml_roundtrip(original_path, new_path))
+            
+            table['ids'] = ['1', '3']
+            self.processor.write_stringtable(new_path, table)
+            self.assertFalse(self.processor.validate_xml_roundtrip(original_path, new_path))
+            
         finally:
             original_path.unlink()
             new_path.unlink()
@@ -34,6 +34,15 @@ def verify_project():
     if input_dir.exists():
         input_files = list(input_dir.rglob("*.stringtable"))
         print(f"✅ Input directory found with {len(input_files)} files")
+        
+        # Parse every input file across worker processes
+        parsed = XMLProcessor().parse_many(input_files)
+        entry_count = sum(len(entries) for entries in parsed.values())
+        if len(parsed) == len(input_files):
+            print(f"✅ All input files parse ({entry_count} entries)")
+        else:
+            print(f"❌ {len(input_files) - len(parsed)} input files failed to parse")
+            return False
     else:
         print("❌ Input directory not found")
         return False